@@ -1,96 +1,114 @@
-from utils.strings_with_arrows import string_with_arrows
-import string
+from utils.strings_with_arrows import string_with_arrows, line_starts
+import operator, sys
 
 #################################################
 # TOKENS
 #################################################
 
 # TT stands for Token Type
-TT_INT = "TT_INT"
-TT_FLOAT = "FLOAT"
-TT_IDENTIFIER = "IDENTIFIER"
-TT_KEYWORD = "KEYWORD"
-TT_PLUS = "PLUS"
-TT_MINUS = "MINUS"
-TT_MUL = "MUL"
-TT_DIV = "DIV"
-TT_EQ = "EQ"
-TT_LPAREN = "LPAREN"
-TT_RPAREN  = "RPAREN"
-TT_POWER = "POWER"
-TT_EOF  = "EOF" # End of File token, used to indicate the end of the input text
+# token types are small ints so they compare fast and can index lookup tables (see BIN_OP_METHODS),
+# TT_NAMES has the names they print as, TT_BY_NAME maps those names back to the type
+TT_NAMES = (
+    "TT_INT", "FLOAT", "IDENTIFIER", "KEYWORD", "PLUS", "MINUS", "MUL", "DIV", "EQ",
+    "LPAREN", "RPAREN", "POWER",
+    "NEWLINE", # only produced by StreamLexer, where every line is its own statement
+    "EOF", # End of File token, used to indicate the end of the input text
+)
+(TT_INT, TT_FLOAT, TT_IDENTIFIER, TT_KEYWORD, TT_PLUS, TT_MINUS, TT_MUL, TT_DIV, TT_EQ,
+ TT_LPAREN, TT_RPAREN, TT_POWER, TT_NEWLINE, TT_EOF) = range(len(TT_NAMES))
+TT_COUNT = len(TT_NAMES)
+TT_BY_NAME = {name: tt for tt, name in enumerate(TT_NAMES)}
+
+# tokens made of a single character
+SINGLE_CHAR_TOKENS = {"+": TT_PLUS, "-": TT_MINUS, "*": TT_MUL, "/": TT_DIV, "^": TT_POWER, "=": TT_EQ, "(": TT_LPAREN, ")": TT_RPAREN}
 
 class Token:
     def __init__(self,type_,value=None, pos_start = None,pos_end = None):
         self.type =  type_
         self.value = value
+        self.pos_start = self.pos_end = None # tokens shared by interned nodes have no position
         
         if pos_start:
             self.pos_start = pos_start.copy()
             self.pos_end = pos_start.copy().advance()
              
         if pos_end: 
-            self.pos_end = pos_end
+            self.pos_end = pos_end.copy() # copy, the lexer keeps advancing the position it passes in
         
     def matches(self, type_, value):
         return self.type == type_ and self.value == value
     
     def __repr__(self): # representation method so it looks nice when printed out in the terminal window
-        if self.value: return f"{self.type}:{self.value}"
-        return f"{self.type}"
+        if self.value: return f"{TT_NAMES[self.type]}:{self.value}"
+        return f"{TT_NAMES[self.type]}"
     
 #################################################
 # DIGITS CONSTNANTS
 #################################################
     
 DIGITS = "0123456789"
-LETTERS = string.ascii_letters
+LETTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" # same as string.ascii_letters, spelled out so importing basic doesn't pull in string and re
 LETTERS_DIGITS = LETTERS + DIGITS
 
-KEYWORDS = ["VAR"]
+KEYWORDS = frozenset(("VAR",))
 
 #################################################
 # ERRORS
 #################################################
 
 class Error:
-    def __init__(self,pos_start, pos_end, error_name, details):
+    """Errors only keep the positions and the pieces of their message, the text itself
+    (details and the arrow excerpt) is built when as_string() asks for it.
+    details can be a format string filled in with details_args, e.g. "'{}' is not defined", name
+    """
+    def __init__(self,pos_start, pos_end, error_name, details, *details_args):
         self.error_name = error_name
-        self.details = details
+        self.details_fmt = details
+        self.details_args = details_args
         self.pos_start = pos_start
         self.pos_end = pos_end
     
+    @property
+    def details(self):
+        if self.details_args: return self.details_fmt.format(*self.details_args)
+        return self.details_fmt
+    
     def as_string(self):
-        result = f"{self.error_name}: {self.details}"
-        result += f"\nFile {self.pos_start.fn}, line {self.pos_start.ln + 1}"
-        result += f", column {self.pos_start.col + 1}"
-        result += f" to {self.pos_end.ln + 1}, column {self.pos_end.col + 1}"
-        result += "\n\n" + string_with_arrows(self.pos_start.ftxt, self.pos_start, self.pos_end)
-        return result
+        if self.pos_start is None: # raised inside an interned tree, which keeps no positions
+            return f"{self.error_name}: {self.details}"
+        return "".join([
+            f"{self.error_name}: {self.details}",
+            f"\nFile {self.pos_start.fn}, line {self.pos_start.ln + 1}",
+            f", column {self.pos_start.col + 1}",
+            f" to {self.pos_end.ln + 1}, column {self.pos_end.col + 1}",
+            "\n\n" + string_with_arrows(self.pos_start.ftxt, self.pos_start, self.pos_end),
+        ])
     
 class IllegalCharError(Error):
-    def __init__(self, pos_start, pos_end, details):
-        super().__init__(pos_start, pos_end, "Illegal Character", details)
+    def __init__(self, pos_start, pos_end, details, *details_args):
+        super().__init__(pos_start, pos_end, "Illegal Character", details, *details_args)
         
 class InvalidSyntaxError(Error):
-    def __init__(self, pos_start, pos_end, details):
-        super().__init__(pos_start, pos_end, "Invalid Syntax", details)
+    def __init__(self, pos_start, pos_end, details, *details_args):
+        super().__init__(pos_start, pos_end, "Invalid Syntax", details, *details_args)
         
 class RTError(Error):
-    def __init__(self,pos_start,pos_end,details):
-        super().__init__(pos_start, pos_end, "Runtime Error", details)
+    def __init__(self,pos_start,pos_end,details, *details_args, context=None):
+        super().__init__(pos_start, pos_end, "Runtime Error", details, *details_args)
+        self.context = context #context the error happened in
         
 #################################################
 # POSITION
 #################################################
 
 class Position:
-    def __init__(self,idx, ln,col, fn, ftxt=None):
+    def __init__(self,idx, ln,col, fn, ftxt=None, ftxt_ln=0):
         self.idx = idx
         self.ln = ln
         self.col = col
         self.fn = fn #file name
         self.ftxt = ftxt #file text, not used in this lexer but could be useful for error messages
+        self.ftxt_ln = ftxt_ln #line number ftxt starts at, streamed sources only keep the current line as ftxt
     def advance(self, current_char=None):
         self.idx += 1
         self.col += 1
@@ -102,7 +120,7 @@ class Position:
         return self
     
     def copy(self):
-        return Position(self.idx, self.ln, self.col, self.fn, self.ftxt) # return a copy of the position so we can save the position before we advance it
+        return Position(self.idx, self.ln, self.col, self.fn, self.ftxt, self.ftxt_ln) # return a copy of the position so we can save the position before we advance it
     
 
 #################################################
@@ -122,55 +140,49 @@ In this case, it will take a string of BASIC code and break it down into tokens
         self.text = text
         self.pos = Position(-1,0,-1,fn=fn,ftxt=text) # initialize the position with -1 index, 0 line number, and -1 column number, -1 column number so we can advance to the first character to 0
         self.current_char = None
+        self.error = None # set by iter_tokens on an illegal character
         self.advance() # initialize the lexer by setting the text, position, and current character
         
     def advance(self, current_char=None):
         self.pos.advance(self.current_char) # advance the position by one character
         self.current_char = self.text[self.pos.idx] if self.pos.idx < len(self.text) else None #advance the position and set the current character to None if we are at the end of the text
         
+    newline_tokens = False # newlines are just whitespace unless a subclass turns them into statement ends
+    
     def make_tokens(self):
-        tokens = []
+        tokens = list(self.iter_tokens())
+        if self.error: return [], self.error # return no tokens and an error if we encounter an illegal character
+        return tokens, None # return the list of tokens and None for no error
+    
+    def iter_tokens(self):
+        """Yield the tokens one by one, ending with EOF.
+        On an illegal character self.error is set and the generator stops with an EOF token at that character,
+        so a parser pulling tokens never sits on a stale operator waiting for more."""
+        self.error = None
         
         while self.current_char != None:
-            if self.current_char in "\t\n\r ": # ignore whitespace characters
+            if self.current_char == "\n" and self.newline_tokens:
+                yield Token(TT_NEWLINE, pos_start=self.pos)
+                self.advance()
+            elif self.current_char in "\t\n\r ": # ignore whitespace characters
                 self.advance()
             elif self.current_char in DIGITS:
-                tokens.append(self.make_number())
+                yield self.make_number()
             elif self.current_char in LETTERS:
-                tokens.append(self.make_identifier())
-            elif self.current_char == "+":
-                tokens.append(Token(TT_PLUS, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "-":
-                tokens.append(Token(TT_MINUS, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "*":
-                tokens.append(Token(TT_MUL, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "/":
-                tokens.append(Token(TT_DIV, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "^": # power operator
-                tokens.append(Token(TT_POWER, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "=": # power operator
-                tokens.append(Token(TT_EQ, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "(":
-                tokens.append(Token(TT_LPAREN, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == ")":
-                tokens.append(Token(TT_RPAREN, pos_start=self.pos))
+                yield self.make_identifier()
+            elif self.current_char in SINGLE_CHAR_TOKENS: # + - * / ^ = ( )
+                yield Token(SINGLE_CHAR_TOKENS[self.current_char], pos_start=self.pos)
                 self.advance()
             else:
                 pos_start = self.pos.copy()# save the position before we advance
                 char = self.current_char
                 self.advance()
-                return [], IllegalCharError(pos_start, self.pos, f"Error on {pos_start.idx} to {self.pos.idx} since '{char}' is not a valid token") # return no tokens and an error if we encounter an illegal character
+                self.error = IllegalCharError(pos_start, self.pos.copy(), "Error on {} to {} since '{}' is not a valid token", pos_start.idx, self.pos.idx, char)
+                yield Token(TT_EOF, pos_start=pos_start)
+                return
           
-        tokens.append(Token(TT_EOF, pos_start=self.pos)) # add an end of file token to the list of tokens
+        yield Token(TT_EOF, pos_start=self.pos) # add an end of file token to the list of tokens
         self.advance() # advance the position to the end of the file
-        return tokens, None # return the list of tokens and None for no error
     
     def make_number(self):
         num_str = ""
@@ -200,8 +212,36 @@ In this case, it will take a string of BASIC code and break it down into tokens
             id_str += self.current_char
             self.advance()
             
+        id_str = sys.intern(id_str) # every use of a name is the same string, symbol table lookups compare by identity
         tok_type = TT_KEYWORD if id_str in KEYWORDS else TT_IDENTIFIER #if string in keywords (like print) then keyword else identifier
         return Token(tok_type, id_str, pos_start, self.pos)
+
+class StreamLexer(Lexer):
+    """Lexer that reads its source a line at a time from a file object (text or binary) or an mmap,
+    so only the current line is ever held in memory. Every newline becomes a NEWLINE token,
+    which the parser uses to end a statement. Positions use the current line as their ftxt.
+    """
+    newline_tokens = True
+    
+    def __init__(self, fn, stream, ln=0):
+        self.stream = stream
+        super().__init__(fn, self.read_line())
+        self.pos.ln = self.pos.ftxt_ln = ln # line number of the first line read, when picking up a stream half way
+        
+    def read_line(self):
+        line = self.stream.readline()
+        return line.decode("utf-8") if isinstance(line, bytes) else line
+        
+    def advance(self, current_char=None):
+        self.pos.advance(self.current_char)
+        if self.pos.idx >= len(self.text) and self.text: # used up this line, move on to the next one
+            line = self.read_line()
+            if line:
+                self.text = line
+                self.pos.idx = 0
+                self.pos.ftxt = line
+                self.pos.ftxt_ln = self.pos.ln
+        self.current_char = self.text[self.pos.idx] if self.pos.idx < len(self.text) else None
 #################################################
 # NODES CLASSES
 #################################################
@@ -252,6 +292,57 @@ class VarAssignNode:
         self.pos_start = self.var_name_tok.pos_start
         self.pos_end = self.var_name_tok.pos_end
 #################################################
+# NODE INTERNING
+#################################################
+
+class NodeInterner:
+    """Hash-consing for AST nodes: structurally identical subtrees, from any number of programs
+    parsed with Parser(tokens, interner), are one shared node object. Shared nodes and their tokens
+    carry no positions (pos_start/pos_end are None), the parser keeps offsets in its spans side table,
+    node_spans() pairs them back up with the nodes of a tree.
+    The table holds nodes weakly, a node goes away once no parsed program uses it.
+    Treat interned nodes as read-only, other programs are looking at them too.
+    """
+    def __init__(self):
+        import weakref # only needed here, keeps importing basic cheap
+        self.table = weakref.WeakValueDictionary() # structure key -> token or node
+        
+    def token(self, tok):
+        key = (Token, tok.type, type(tok.value), tok.value)
+        shared = self.table.get(key)
+        if shared is None: shared = self.table[key] = Token(tok.type, tok.value)
+        return shared
+    
+    def node(self, cls, *args):
+        # tokens are interned first, after that two children are equal exactly when they are the same object
+        args = tuple(self.token(a) if isinstance(a, Token) else a for a in args)
+        key = (cls,) + tuple(id(a) for a in args)
+        shared = self.table.get(key)
+        if shared is None: shared = self.table[key] = cls(*args)
+        return shared
+    
+    def __len__(self):
+        return len(self.table)
+
+CHILD_ATTRS = ("left_node", "node", "value_node", "right_node") # child nodes in parse order
+
+def node_spans(root, spans, first=0):
+    """Yield (node, start, end) for every node of a tree parsed with an interner, start/end being
+    character offsets from the parser's spans. The parser adds a span each time it builds a node,
+    children left to right before their parent, so walking the tree in that order lines the two up.
+    A node used twice in the tree comes out once per use. first is the number of nodes built
+    before this tree by the same parser."""
+    i = first
+    def walk(node):
+        nonlocal i
+        for attr in CHILD_ATTRS:
+            child = node.__dict__.get(attr)
+            if child is not None: yield from walk(child)
+        yield node, spans[2 * i], spans[2 * i + 1]
+        i += 1
+    return walk(root)
+
+#################################################
 # PARSE RESULT
 #################################################
 class ParseResult: 
@@ -284,15 +375,33 @@ class ParseResult:
 #################################################
 
 class Parser:
-    def __init__(self,tokens):
-        self.tok = tokens
+    def __init__(self,tokens, interner=None):
+        self.tok = iter(tokens) # a list or a generator, tokens are only pulled when the parser needs the next one
         self.tok_idx = -1 #token index
+        self.current_tok = None
+        self.interner = interner # NodeInterner to share identical subtrees with other programs, or None
+        self.spans = None # with an interner: start, end offset of every node built, children before parents
+        self.span_stack = [] # spans of built nodes not yet used by a parent
+        if interner is not None:
+            from array import array # only needed for the side table, keeps importing basic cheap
+            self.spans = array("l")
         self.advance()
         
+    def node(self, cls, *args): # build an AST node, through the interner if there is one
+        if self.interner is None: return cls(*args)
+        
+        n_children = sum(1 for a in args if not isinstance(a, Token))
+        children = self.span_stack[len(self.span_stack) - n_children:]
+        del self.span_stack[len(self.span_stack) - n_children:]
+        start = args[0].pos_start.idx if isinstance(args[0], Token) else children[0][0]
+        end = args[-1].pos_end.idx if isinstance(args[-1], Token) else children[-1][1]
+        self.span_stack.append((start, end))
+        self.spans.extend((start, end))
+        return self.interner.node(cls, *args)
+        
     def advance(self):
         self.tok_idx += 1
-        if self.tok_idx < len(self.tok):
-            self.current_tok = self.tok[self.tok_idx]
+        self.current_tok = next(self.tok, self.current_tok) # past the end we stay on the last token (EOF)
         return self.current_tok 
     
     def parse(self): #call expression - advance till find plus or minus
@@ -301,6 +410,24 @@ class Parser:
             return res.failure(InvalidSyntaxError(self.current_tok.pos_start, self.current_tok.pos_end, "Expected '+', '-', '*', '/', '^' or EOF"))
         return res
     
+    def parse_statement(self):
+        """Parse the next newline-separated statement, for token streams from StreamLexer.
+        Returns None once the stream is at EOF."""
+        while self.current_tok.type == TT_NEWLINE:
+            self.advance()
+        if self.current_tok.type == TT_EOF: return None
+        
+        res = self.expr()
+        if res.error: return res
+        if self.current_tok.type not in (TT_NEWLINE, TT_EOF): # stay on the NEWLINE, lexing the next line waits for the next statement
+            return res.failure(InvalidSyntaxError(self.current_tok.pos_start, self.current_tok.pos_end, "Expected '+', '-', '*', '/', '^', newline or EOF"))
+        return res
+    
+    def skip_statement(self):
+        """Skip the rest of a statement that failed to parse."""
+        while self.current_tok.type not in (TT_NEWLINE, TT_EOF):
+            self.advance()
+    
     def power(self):
         return self.bin_op(self.atom, (TT_POWER,), self.factor)
     
@@ -310,12 +437,12 @@ class Parser:
         
         if tok.type == TT_IDENTIFIER:
             res.register(self.advance())
-            return res.success(VarAccessNode(tok))
+            return res.success(self.node(VarAccessNode, tok))
         
         #normal operations
         elif tok.type in (TT_INT, TT_FLOAT):
             res.register(self.advance()) #wrap the advance in a parse result object but not doing anything yet
-            return res.success(NumberNode(tok)) #recursive functions since call eachother
+            return res.success(self.node(NumberNode, tok)) #recursive functions since call eachother
         
         #if token is a left parenthesis, call expression and return the node
         elif tok.type == TT_LPAREN:
@@ -340,7 +467,7 @@ class Parser:
             res.register(self.advance()) #advance to the next token
             node = res.register(self.factor()) #call factor again to get the next node
             if res.error: return res
-            return res.success(UnaryOpNode(tok, node)) #return a unary operation node with the token and the node
+            return res.success(self.node(UnaryOpNode, tok, node)) #return a unary operation node with the token and the node
         
         return self.power()
     
@@ -367,7 +494,7 @@ class Parser:
             expr = res.register(self.expr())
             if res.error: return res
             
-            return res.success(VarAssignNode(var_name, expr))
+            return res.success(self.node(VarAssignNode, var_name, expr))
             
         return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
     
@@ -391,7 +518,7 @@ class Parser:
             
             if res.error: return res # if there is an error, return the error
             
-            left = BinOpNode(left,op_tok,right)
+            left = self.node(BinOpNode, left,op_tok,right)
             
         return res.success(left) #now a binary operation node because we re-assigned it - becomes a term
         
@@ -423,6 +550,9 @@ class RTResult:
 #################################################
 
 class Number: #class to store number and operating on them with other numbers
+    # set_pos/set_context are only called on a Number that was just created, once a value is stored
+    # (symbol table) or handed back it is never changed, readers take a copy() to give it their own position.
+    # That keeps one Interpreter and shared tables safe to use from several threads.
     def __init__(self, value):
         self.value = value #python number
         self.set_pos()
@@ -440,6 +570,9 @@ class Number: #class to store number and operating on them with other numbers
         self.context = context
         return self
     
+    def copy(self): # same value, own position and context
+        return Number(self.value).set_pos(self.pos_start, self.pos_end).set_context(self.context)
+    
     def added_to(self,other):
         if isinstance(other,Number): #check if value we are operating on is another number
             return Number(self.value + other.value).set_context(self.context) , None # add our value to the other value
@@ -456,13 +589,27 @@ class Number: #class to store number and operating on them with other numbers
     def dived_by(self,other):        
         if isinstance(other,Number): #check if value we are operating on is another number
             if other.value ==0:
-                return None, RTError(other.pos_start , other.pos_end, "Division by zero", self.context) 
+                return None, RTError(other.pos_start , other.pos_end, "Division by zero", context=self.context) 
             return Number(self.value / other.value).set_context(self.context), None # / our value to the other value
         
     def power_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value ** other.value).set_context(self.context), None
+            try:
+                return Number(self.value ** other.value).set_context(self.context), None
+            except ZeroDivisionError: # 0 ^ -1
+                return None, RTError(self.pos_start, other.pos_end, "Zero raised to a negative power", context=self.context)
+            except OverflowError: # 2.0 ^ 10000
+                return None, RTError(self.pos_start, other.pos_end, "Result too large", context=self.context)
+
 
+# Number method for each binary operator token type, indexed by the type
+BIN_OP_METHODS = [None] * TT_COUNT
+BIN_OP_METHODS[TT_PLUS] = Number.added_to
+BIN_OP_METHODS[TT_MINUS] = Number.subbed_by
+BIN_OP_METHODS[TT_MUL] = Number.multed_by
+BIN_OP_METHODS[TT_DIV] = Number.dived_by
+BIN_OP_METHODS[TT_POWER] = Number.power_by
+BIN_OP_METHODS = tuple(BIN_OP_METHODS)
 
 #################################################
 # CONTEXT
@@ -499,8 +646,123 @@ class SymbolTable:
     def remove(self,name):
         del self.symbols[name]
         
+
+#################################################
+# PERSISTENT SYMBOL TABLE
+#################################################
+# hash array mapped trie: every node holds up to 32 slots picked by 5 bits of the name's hash,
+# a slot is either a (name, value) pair or a child node. Nodes are never changed after they are built,
+# a write copies only the nodes on the path to its slot and shares everything else.
+
+HAMT_BITS = 5
+HAMT_MASK = (1 << HAMT_BITS) - 1
+HASH_BITS = 64 # python hashes are at most 64 bits, past that two names can only be told apart by comparing them
+HASH_MASK = (1 << HASH_BITS) - 1
+
+class HamtNode:
+    __slots__ = ("bitmap", "slots")
+    
+    def __init__(self, bitmap, slots):
+        self.bitmap = bitmap #bit i set if there is a slot for hash chunk i
+        self.slots = slots #tuple, one entry per set bit in bitmap order
+        
+    def get(self, name, h, shift):
+        bit = 1 << ((h >> shift) & HAMT_MASK)
+        if not self.bitmap & bit: return None
+        slot = self.slots[(self.bitmap & (bit - 1)).bit_count()]
+        if type(slot) is tuple:
+            return slot[1] if slot[0] == name else None
+        return slot.get(name, h, shift + HAMT_BITS)
+    
+    def set(self, name, value, h, shift):
+        bit = 1 << ((h >> shift) & HAMT_MASK)
+        idx = (self.bitmap & (bit - 1)).bit_count()
+        if not self.bitmap & bit: #free slot
+            return HamtNode(self.bitmap | bit, self.slots[:idx] + ((name, value),) + self.slots[idx:])
+        
+        slot = self.slots[idx]
+        if type(slot) is tuple:
+            if slot[0] == name: new_slot = (name, value)
+            else: new_slot = hamt_pair_node(slot, hash(slot[0]) & HASH_MASK, (name, value), h, shift + HAMT_BITS)
+        else:
+            new_slot = slot.set(name, value, h, shift + HAMT_BITS)
+        return HamtNode(self.bitmap, self.slots[:idx] + (new_slot,) + self.slots[idx + 1:])
+    
+    def remove(self, name, h, shift): # returns the new node, None if it ended up empty
+        bit = 1 << ((h >> shift) & HAMT_MASK)
+        if not self.bitmap & bit: raise KeyError(name)
+        idx = (self.bitmap & (bit - 1)).bit_count()
+        
+        slot = self.slots[idx]
+        if type(slot) is tuple:
+            if slot[0] != name: raise KeyError(name)
+            new_slot = None
+        else:
+            new_slot = slot.remove(name, h, shift + HAMT_BITS)
+        
+        if new_slot is None:
+            if self.bitmap == bit: return None
+            return HamtNode(self.bitmap & ~bit, self.slots[:idx] + self.slots[idx + 1:])
+        return HamtNode(self.bitmap, self.slots[:idx] + (new_slot,) + self.slots[idx + 1:])
+
+class HamtCollisionNode:
+    """Bottom of the trie, for names whose whole hash is equal."""
+    __slots__ = ("pairs",)
+    
+    def __init__(self, pairs):
+        self.pairs = pairs
         
+    def get(self, name, h, shift):
+        for key, value in self.pairs:
+            if key == name: return value
+        return None
+    
+    def set(self, name, value, h, shift):
+        pairs = tuple(p for p in self.pairs if p[0] != name)
+        return HamtCollisionNode(pairs + ((name, value),))
+    
+    def remove(self, name, h, shift):
+        pairs = tuple(p for p in self.pairs if p[0] != name)
+        if len(pairs) == len(self.pairs): raise KeyError(name)
+        return HamtCollisionNode(pairs) if pairs else None
+
+def hamt_pair_node(pair_a, h_a, pair_b, h_b, shift): # node holding two pairs that collided in the level above
+    if shift >= HASH_BITS:
+        return HamtCollisionNode((pair_a, pair_b))
+    chunk_a, chunk_b = (h_a >> shift) & HAMT_MASK, (h_b >> shift) & HAMT_MASK
+    if chunk_a == chunk_b:
+        return HamtNode(1 << chunk_a, (hamt_pair_node(pair_a, h_a, pair_b, h_b, shift + HAMT_BITS),))
+    if chunk_a > chunk_b:
+        pair_a, pair_b, chunk_a, chunk_b = pair_b, pair_a, chunk_b, chunk_a
+    return HamtNode((1 << chunk_a) | (1 << chunk_b), (pair_a, pair_b))
+
+EMPTY_HAMT = HamtNode(0, ())
+
+class PersistentSymbolTable:
+    """Drop-in SymbolTable whose contents are a persistent hash trie.
+    fork() is O(1): both tables share the same trie, and a set() on either copies only
+    the few nodes on the path to that name, so the other one never sees the change.
+    Useful for running many what-if variants from one common base state.
+    """
+    def __init__(self, root=EMPTY_HAMT, parent=None):
+        self.root = root
+        self.parent = parent
+        
+    def get(self, name):
+        value = self.root.get(name, hash(name) & HASH_MASK, 0)
+        if value == None and self.parent: #same lookup rules as SymbolTable
+            return self.parent.get(name)
+        
+        return value
+    
+    def set(self, name, value):
+        self.root = self.root.set(name, value, hash(name) & HASH_MASK, 0)
         
+    def remove(self, name):
+        self.root = self.root.remove(name, hash(name) & HASH_MASK, 0) or EMPTY_HAMT
+        
+    def fork(self):
+        return PersistentSymbolTable(self.root, self.parent)
         
 
 #################################################
@@ -527,9 +789,9 @@ class Interpreter:
         value = context.symbol_table.get(var_name)
         
         if not value:
-            return res.failure(RTError(node.pos_start, node.pos_end, f"'{var_name}' is not defined", self.context))
+            return res.failure(RTError(node.pos_start, node.pos_end, "'{}' is not defined", var_name, context=context))
         
-        return res.success(value.set_pos(node.pos_start, node.pos_end)) #return the value of the variable
+        return res.success(value.copy().set_pos(node.pos_start, node.pos_end)) #return a copy of the variable's value, the stored one is shared
     
     def visit_VarAssignNode(self, node, context):
         print("Found VarAssignNode!")
@@ -552,20 +814,15 @@ class Interpreter:
         right = res.register(self.visit(node.right_node, context)) #visit child node
         if res.error: return res
         
-        error = None
+        return self.bin_op(node, left, right)
         
-        if node.op_tok.type == TT_PLUS:
-            result,error = left.added_to(right)
-        elif node.op_tok.type == TT_MINUS:
-            result,error = left.subbed_by(right)
-        elif node.op_tok.type == TT_MUL:
-            result,error = left.multed_by(right)
-        elif node.op_tok.type == TT_DIV:
-            result,error = left.dived_by(right)
-        elif node.op_tok.type == TT_POWER:
-            result, error = left.power_by(right)
-        else:
-            raise Exception("Not a BinOp found: ",node.op_tok.type)
+    def bin_op(self, node, left, right): # apply node's operator to already evaluated operands
+        res = RTResult()
+        
+        method = BIN_OP_METHODS[node.op_tok.type]
+        if method is None:
+            raise Exception("Not a BinOp found: ",TT_NAMES[node.op_tok.type])
+        result,error = method(left, right)
         
         if error:
             return res.failure(error)
@@ -584,7 +841,8 @@ class Interpreter:
         
         if node.op_tok.type == TT_MINUS:
             number, error = number.multed_by(Number(-1))
-            
+        else:
+            number = number.copy() # +x, don't move the position of a value someone else may hold
         
         if error:
             return res.failure(error)
@@ -592,29 +850,340 @@ class Interpreter:
             return res.success(number.set_pos(node.pos_start, node.pos_end))
 
 
+
+#################################################
+# PROFILER
+#################################################
+
+class SpanStats:
+    def __init__(self, node_type, pos_start, pos_end):
+        self.node_type = node_type
+        self.pos_start = pos_start
+        self.pos_end = pos_end
+        self.count = 0 #times the node was evaluated
+        self.total = 0.0 #seconds, including the node's children
+        self.self_time = 0.0 #seconds spent in the node itself
+        
+    def source(self): # the source text of the span, on one line
+        text = self.pos_start.ftxt or ""
+        starts = line_starts(text)
+        first = self.pos_start.ln - self.pos_start.ftxt_ln
+        line_end = starts[first + 1] - 1 if first + 1 < len(starts) else len(text)
+        end = self.pos_end.col if self.pos_end.ln == self.pos_start.ln else line_end - starts[first]
+        return text[starts[first] + self.pos_start.col:starts[first] + end]
+
+class Profiler:
+    """Counts evaluations and time per AST node, keyed by the node's source span (pos_start/pos_end).
+    attach() swaps a timing wrapper in as that interpreter's visit, detach() takes it out again,
+    so an interpreter without a profiler runs exactly the same code as before.
+    Attach before running an AdaptiveInterpreter, its quick handlers hold on to visit.
+    Interned nodes (NodeInterner) have no positions and may belong to many programs at once,
+    so they get no span: their time goes to their parent and they are only counted in unplaced.
+    """
+    def __init__(self):
+        self.spans = {} # (file name, start line, start col, end line, end col, node type) -> SpanStats
+        self.child_time = [0.0] # time spent in children, one entry per node being evaluated
+        self.unplaced = 0 # evaluations of nodes without a position
+        
+    def attach(self, interpreter):
+        from time import perf_counter
+        inner = interpreter.visit
+        spans, child_time = self.spans, self.child_time
+        
+        def visit(node, context):
+            child_time.append(0.0)
+            t = perf_counter()
+            res = inner(node, context)
+            elapsed = perf_counter() - t
+            children = child_time.pop()
+            child_time[-1] += elapsed
+            
+            ps, pe = node.pos_start, node.pos_end
+            if ps is None: # interned, counted as part of its parent
+                self.unplaced += 1
+                child_time[-1] -= elapsed - children
+                return res
+            key = (ps.fn, ps.ln, ps.col, pe.ln, pe.col, type(node).__name__)
+            stats = spans.get(key)
+            if stats is None: stats = spans[key] = SpanStats(type(node).__name__, ps, pe)
+            stats.count += 1
+            stats.total += elapsed
+            stats.self_time += elapsed - children
+            return res
+        
+        interpreter.visit = visit
+        return interpreter
+    
+    def detach(self, interpreter):
+        interpreter.__dict__.pop("visit", None)
+        
+    def hottest(self, limit=None): # spans by self time, hottest first
+        spans = sorted(self.spans.values(), key=lambda s: s.self_time, reverse=True)
+        return spans[:limit] if limit else spans
+    
+    def line_times(self): # (file name, line) -> self time of all spans starting on that line
+        lines = {}
+        for s in self.spans.values():
+            key = (s.pos_start.fn, s.pos_start.ln)
+            lines[key] = lines.get(key, 0.0) + s.self_time
+        return lines
+        
+    def report(self, limit=20):
+        rows = [f"{'where':<24} {'node':<14} {'count':>8} {'total ms':>10} {'self ms':>10}  source"]
+        for s in self.hottest(limit):
+            ps, pe = s.pos_start, s.pos_end
+            end = f"{pe.col + 1}" if pe.ln == ps.ln else f"{pe.ln + 1}:{pe.col + 1}" # file:line:col-col, or file:line:col-line:col
+            where = f"{ps.fn}:{ps.ln + 1}:{ps.col + 1}-{end}"
+            rows.append(f"{where:<24} {s.node_type:<14} {s.count:>8} {s.total * 1000:>10.3f} {s.self_time * 1000:>10.3f}  {s.source()}")
+        return "\n".join(rows)
+
+#################################################
+# ADAPTIVE INTERPRETER
+#################################################
+
+# python operator for each binary op token, used by the specialised handlers
+FAST_OPS = {TT_PLUS: operator.add, TT_MINUS: operator.sub, TT_MUL: operator.mul, TT_DIV: operator.truediv, TT_POWER: operator.pow}
+FAST_TYPES = (int, float)
+MAX_SPECIALIZE = 4 # after this many type changes a site stays on the generic path
+
+class AdaptiveInterpreter(Interpreter):
+    """Interpreter that quickens the tree while it runs it, pays off when the same AST is executed many times.
+    The first time a BinOpNode runs it records its operand types (int/int, float/float or mixed) and
+    installs a handler specialised for that op and those types as node.quick. Later visits call the
+    handler directly: no visit_ lookup, no if/elif over the op type, no isinstance checks.
+    If the operands change type the handler falls back to the generic path and the site is respecialised.
+    NumberNodes are quickened into constant builders, VarAccessNodes into a symbol table lookup and
+    UnaryOpNodes into a negate or copy, so a quickened expression never goes through the visit_ lookup.
+    Quickened nodes skip the "Found ..." debug prints.
+    """
+    def __init__(self):
+        import threading # only needed here, keeps importing basic cheap
+        self.stats = {"specialized": 0, "despecialized": 0, "generic": 0} # sites specialised, guards that failed, sites given up on
+        self.stats_lock = threading.Lock() # the interpreter can be shared between threads
+        
+    def count(self, stat):
+        with self.stats_lock: self.stats[stat] += 1
+    
+    def visit(self, node, context):
+        quick = node.__dict__.get("quick")
+        if quick: return quick(context)
+        return super().visit(node, context)
+    
+    def visit_NumberNode(self, node, context):
+        value, pos_start, pos_end = node.tok.value, node.pos_start, node.pos_end
+        def quick(context):
+            return RTResult().success(Number(value).set_context(context).set_pos(pos_start, pos_end))
+        node.quick = quick
+        return quick(context)
+    
+    def visit_VarAccessNode(self, node, context):
+        var_name, pos_start, pos_end = node.var_name_tok.value, node.pos_start, node.pos_end
+        def quick(context):
+            value = context.symbol_table.get(var_name)
+            if not value:
+                return RTResult().failure(RTError(pos_start, pos_end, "'{}' is not defined", var_name, context=context))
+            return RTResult().success(value.copy().set_pos(pos_start, pos_end))
+        node.quick = quick
+        return quick(context)
+    
+    def visit_UnaryOpNode(self, node, context):
+        negate = node.op_tok.type == TT_MINUS
+        inner, pos_start, pos_end = node.node, node.pos_start, node.pos_end
+        visit = self.visit
+        def quick(context):
+            res = RTResult()
+            number = res.register(visit(inner, context))
+            if res.error: return res
+            if negate: number = Number(number.value * -1).set_context(number.context) # same as multed_by(Number(-1))
+            else: number = number.copy()
+            return res.success(number.set_pos(pos_start, pos_end))
+        node.quick = quick
+        return quick(context)
+    
+    def visit_BinOpNode(self, node, context):
+        res = RTResult()
+        
+        left = res.register(self.visit(node.left_node, context))
+        if res.error: return res
+        right = res.register(self.visit(node.right_node, context))
+        if res.error: return res
+        
+        self.specialize(node, type(left.value), type(right.value))
+        return self.bin_op(node, left, right)
+    
+    def specialize(self, node, left_type, right_type):
+        times = node.__dict__.get("times_specialized", 0)
+        if node.op_tok.type not in FAST_OPS or left_type not in FAST_TYPES or right_type not in FAST_TYPES: return
+        if times >= MAX_SPECIALIZE:
+            with self.stats_lock:
+                if node.__dict__.get("times_specialized") == MAX_SPECIALIZE: # giving up on this site now, count it once
+                    node.times_specialized = MAX_SPECIALIZE + 1
+                    self.stats["generic"] += 1
+            return
+        node.times_specialized = times + 1
+        node.quick = self.make_quick(node, left_type, right_type)
+        self.count("specialized")
+        
+    def make_quick(self, node, left_type, right_type):
+        op = FAST_OPS[node.op_tok.type]
+        check_zero = node.op_tok.type == TT_DIV
+        left_node, right_node = node.left_node, node.right_node
+        pos_start, pos_end = node.pos_start, node.pos_end
+        visit = self.visit
+        
+        def quick(context):
+            res = RTResult()
+            left = res.register(visit(left_node, context))
+            if res.error: return res
+            right = res.register(visit(right_node, context))
+            if res.error: return res
+            
+            lv, rv = left.value, right.value
+            if type(lv) is not left_type or type(rv) is not right_type: # types changed, go back to generic and respecialise
+                node.__dict__.pop("quick", None) # another thread may have got here first
+                self.count("despecialized")
+                self.specialize(node, type(lv), type(rv))
+                return self.bin_op(node, left, right)
+            if check_zero and rv == 0:
+                return self.bin_op(node, left, right) # let the generic path build the division by zero error
+            try:
+                value = op(lv, rv)
+            except ArithmeticError: # 0 ^ -1, 2.0 ^ 10000: the generic path builds the error
+                return self.bin_op(node, left, right)
+            return res.success(Number(value).set_context(left.context).set_pos(pos_start, pos_end))
+        return quick
+
+#################################################
+# COMMON SUBEXPRESSION ELIMINATION
+#################################################
+
+def cse_annotate(node):
+    """Give node and its children a structural key (node.cse_key), the variables it reads (node.cse_vars)
+    and its size in nodes (node.cse_size). Trees that are equal get equal keys; anything containing
+    an assignment has side effects and gets key None. Returns the key."""
+    if "cse_key" in node.__dict__: return node.cse_key
+    
+    if isinstance(node, NumberNode):
+        key, names, size = ("num", type(node.tok.value), node.tok.value), frozenset(), 1
+    elif isinstance(node, VarAccessNode):
+        key, names, size = ("var", node.var_name_tok.value), frozenset((node.var_name_tok.value,)), 1
+    elif isinstance(node, UnaryOpNode):
+        inner = cse_annotate(node.node)
+        key = None if inner is None else ("unary", node.op_tok.type, inner)
+        names, size = node.node.cse_vars, node.node.cse_size + 1
+    elif isinstance(node, BinOpNode):
+        left, right = cse_annotate(node.left_node), cse_annotate(node.right_node)
+        key = None if left is None or right is None else ("bin", node.op_tok.type, left, right)
+        names = node.left_node.cse_vars | node.right_node.cse_vars
+        size = node.left_node.cse_size + node.right_node.cse_size + 1
+    else: # VarAssignNode, or anything new
+        if isinstance(node, VarAssignNode): cse_annotate(node.value_node)
+        key, names, size = None, frozenset(), 1
+        
+    node.cse_key, node.cse_vars, node.cse_size = key, names, size
+    return key
+
+class CSEInterpreter(Interpreter):
+    """Interpreter that evaluates every distinct side-effect-free BinOp/UnaryOp subtree once, however
+    often it is repeated in an expression or across statements, and reuses the value after that.
+    A VAR assignment drops the cached values that read the assigned variable.
+    Use one instance per run or session, with all assignments going through it: values are cached
+    against the variables' state as seen by this interpreter. Not for sharing between threads.
+    """
+    def __init__(self):
+        self.cache = {} # structural key -> Number
+        self.readers = {} # variable name -> keys in cache that read it
+        self.stats = {"evaluated": 0, "reused": 0, "saved": 0} # subtrees computed, subtrees reused, node evaluations skipped
+        
+    def visit(self, node, context):
+        key = cse_annotate(node)
+        if key is None or not isinstance(node, (BinOpNode, UnaryOpNode)): # leaves are as cheap as a cache lookup
+            return super().visit(node, context)
+        
+        value = self.cache.get(key)
+        if value is not None:
+            self.stats["reused"] += 1
+            self.stats["saved"] += node.cse_size
+            return RTResult().success(value.copy().set_context(context).set_pos(node.pos_start, node.pos_end))
+        
+        res = super().visit(node, context)
+        if not res.error:
+            self.stats["evaluated"] += 1
+            self.cache[key] = res.value
+            for name in node.cse_vars: self.readers.setdefault(name, set()).add(key)
+        return res
+    
+    def visit_VarAssignNode(self, node, context):
+        res = super().visit_VarAssignNode(node, context)
+        if not res.error:
+            for key in self.readers.pop(node.var_name_tok.value, ()):
+                self.cache.pop(key, None)
+        return res
         
 #################################################
 # RUN
 #################################################
 
-global_symbol_table = SymbolTable() #global symbol table for all variables, used to store variables and their values
-global_symbol_table.set("null", Number(0)) #set a null variable to 0, used to represent no value
+def make_global_symbol_table(table=None): # fresh table with the built-in names, e.g. one per thread or per job
+    if table is None: table = SymbolTable()
+    table.set("null", Number(0)) #set a null variable to 0, used to represent no value
+    return table
+
+global_symbol_table = make_global_symbol_table() #global symbol table for all variables, used to store variables and their values
 
-def run(fn,text):
+def parse(fn, text, interner=None): # lex and parse only, returns (ast node, error) so the same tree can be executed many times
     lexer = Lexer(fn,text)
     tokens, error = lexer.make_tokens()
     
     if error: return None, error
     
     # Generate Abstract Syntax Tree
-    parser = Parser(tokens)
+    parser = Parser(tokens, interner)
     ast = parser.parse()
-    if ast.error: return None, ast.error
+    return ast.node, ast.error
+
+def execute(node, interpreter=None, symbol_table=None): # run a parsed tree, pass an AdaptiveInterpreter to quicken it across executions
+    if interpreter is None: interpreter = Interpreter()
+    context = Context("<program>") #create a context for the program
+    context.symbol_table = symbol_table or global_symbol_table #the global symbol table unless given e.g. a PersistentSymbolTable fork
+    result = interpreter.visit(node, context)
+    
+    if result.error: return None, result.error
+    return result.value.value, None
+
+def run(fn,text, interpreter=None, symbol_table=None):
+    node, error = parse(fn, text)
+    if error: return None, error
     
     #Run Program
-    interpreter = Interpreter()
-    context = Context("<program>") #create a context for the program
-    context.symbol_table = global_symbol_table #set the symbol table to the global symbol table
-    result = interpreter.visit(ast.node, context)
+    return execute(node, interpreter, symbol_table)
+
+def run_stream(fn, stream, interpreter=None, symbol_table=None):
+    """Run a program statement by statement (one per line) straight from a file object or mmap.
+    Tokens are lexed as the parser asks for them and each statement runs as soon as it is parsed,
+    so memory stays constant however long the program is. Yields (value, error) per statement;
+    a statement with an error is reported and skipped, after an illegal character the rest of its line is skipped.
+    """
+    lexer = StreamLexer(fn, stream)
+    parser = Parser(lexer.iter_tokens())
+    if interpreter is None: interpreter = Interpreter()
+    context = Context("<program>")
+    context.symbol_table = symbol_table or global_symbol_table
     
-    return result.value.value, result.error
\ No newline at end of file
+    while True:
+        ast = parser.parse_statement()
+        if lexer.error:
+            yield None, lexer.error
+            # the lexer stops for good on an illegal character, carry on with a new one from the next line
+            lexer = StreamLexer(fn, stream, lexer.error.pos_start.ln + 1)
+            parser = Parser(lexer.iter_tokens())
+            continue
+        if ast is None: return
+        if ast.error:
+            yield None, ast.error
+            parser.skip_statement()
+            continue
+        
+        result = interpreter.visit(ast.node, context)
+        if result.error: yield None, result.error
+        else: yield result.value.value, None
\ No newline at end of file
@@ -0,0 +1,45 @@
+# cse_bench.py
+# Report for CSEInterpreter: runs a generated colour-grammar session through a plain Interpreter and
+# through CSEInterpreter, checks every statement gives the same value or error, and prints the
+# CSE counts and both run times.
+# Run: python cse_bench.py [statements] [seed]
+
+import contextlib, io, os, random, sys, time
+import basic
+
+NAMES = "abcdefgh"
+REPEATED = ["(a + b)", "(c * d)", "(a - 1)", "(b / 2)", "(e ^ 2)"] # pieces that keep coming back, like copied rows in the notebook
+
+def make_corpus(n, seed=5):
+    """One statement per line: every name a-h set first, then n expressions over them, 15% of them VAR assignments."""
+    rng = random.Random(seed)
+    def expr(depth=0):
+        if depth > 2 or rng.random() < 0.3:
+            return rng.choice(REPEATED + list(NAMES) + [str(rng.randint(1, 9))])
+        return f"({expr(depth + 1)} {rng.choice('+-*/')} {expr(depth + 1)})"
+    lines = [f"VAR {name} = {rng.randint(1, 9)}" for name in NAMES]
+    for _ in range(n):
+        lines.append(f"VAR {rng.choice(NAMES)} = {expr()}" if rng.random() < 0.15 else expr())
+    return "\n".join(lines)
+
+def run_session(src, interpreter):
+    t = time.perf_counter()
+    results = list(basic.run_stream("<corpus>", io.StringIO(src), interpreter, basic.make_global_symbol_table()))
+    elapsed = time.perf_counter() - t
+    return [(repr(value), error.as_string() if error else None) for value, error in results], elapsed # repr so nan == nan
+
+def main(n=3000, seed=5):
+    src = make_corpus(n, seed)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # silence the interpreter's debug prints
+        plain, t_plain = run_session(src, basic.Interpreter())
+        cse = basic.CSEInterpreter()
+        reused, t_cse = run_session(src, cse)
+
+    same = plain == reused
+    stats = cse.stats
+    print(f"{len(plain)} statements: {stats['evaluated']} subexpressions evaluated, {stats['reused']} reused, "
+          f"{stats['saved']} node evaluations saved")
+    print(f"plain {t_plain:.3f}s  cse {t_cse:.3f}s  results {'identical' if same else 'DIFFERENT'}")
+    return 0 if same else 1
+
+if __name__ == "__main__": sys.exit(main(*map(int, sys.argv[1:])))
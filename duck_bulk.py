@@ -0,0 +1,123 @@
+# duck_bulk.py
+# Batch versions of the colour grammar in duck_grammar.py, for converting whole archives at once.
+# - decode_grid(grid)  : N×ROW_LEN int array of cells -> list of N source strings
+# - encode_lines(lines): list of source lines -> N×width int array of cells
+# Both give exactly the same result as tokenize_cells_to_source / encode_line_to_cells row by row.
+# Run this file to benchmark against the per-row versions.
+
+import re
+import numpy as np
+from duck_grammar import OP_BY_DOUBLE, IDENT_BY_PAIR, DOUBLE_BY_OP, IDENT_TO_DIGIT, ROW_LEN, tokenize_cells_to_source, encode_line_to_cells
+
+# ───────── decoding ─────────
+# every cell is turned into a small code, and the code into the text it contributes:
+#   0..9   digit cell          -> "0".."9" (digits next to each other make one number)
+#   10     blank or second half of a pair -> "" (v is never 0 for a double)
+#   10+v   double v v          -> "+", "VAR", ...
+#   20+d   9 then d            -> "a", "b", ...
+#   29     end of row          -> "\n"
+# codes of cells that start a new token, other than the first one in their row, get SPACED added
+# so they pick up the separating space.
+CODE_SKIP = 10
+CODE_DOUBLE = 10
+CODE_IDENT = 20
+CODE_EOL = 29
+SPACED = 30
+
+PIECES = np.full(2 * SPACED, "", dtype=object)
+PIECES[:10] = [str(d) for d in range(10)]
+for v in range(1, 10): PIECES[CODE_DOUBLE + v] = OP_BY_DOUBLE[v]
+for d in range(1, 9): PIECES[CODE_IDENT + d] = IDENT_BY_PAIR[d]
+PIECES[CODE_EOL] = "\n"
+PIECES[SPACED:] = [" " + p for p in PIECES[:SPACED]]
+
+def decode_grid(grid):
+    """Decode every row of an N×ROW_LEN grid of cell values (-1 = blank) into source text."""
+    cells = np.asarray(grid, dtype=np.int8)
+    if cells.ndim == 1: cells = cells[None, :]
+    n, width = cells.shape
+    nxt = np.full_like(cells, -2) #-2 past the end of the row so nothing pairs with it
+    nxt[:, :-1] = cells[:, 1:]
+
+    # a cell can open a pair if it and its right neighbour make a double or a 9+digit identifier
+    is_double = (cells == nxt) & (cells >= 1)
+    is_ident = (cells == 9) & (nxt >= 1) & (nxt <= 8)
+    pairable = is_double | is_ident
+
+    # pairs are taken greedily left to right, so inside a run of pairable cells
+    # only every other cell (counting from the start of the run) really opens a pair
+    cols = np.broadcast_to(np.arange(width), cells.shape)
+    prev = np.zeros_like(pairable)
+    prev[:, 1:] = pairable[:, :-1]
+    run_start = np.maximum.accumulate(np.where(pairable & ~prev, cols, 0), axis=1)
+    opens = pairable & ((cols - run_start) % 2 == 0)
+    closes = np.zeros_like(opens)
+    closes[:, 1:] = opens[:, :-1]
+
+    codes = cells.astype(np.int16)
+    codes[cells == -1] = CODE_SKIP
+    codes[opens & is_double] = CODE_DOUBLE + cells[opens & is_double]
+    ident = opens & ~is_double
+    codes[ident] = CODE_IDENT + nxt[ident]
+    codes[closes] = CODE_SKIP
+
+    # a token starts at every pair and at every digit that does not continue a number
+    digit = codes < CODE_SKIP
+    prev_digit = np.zeros_like(digit)
+    prev_digit[:, 1:] = digit[:, :-1]
+    starts = opens | (digit & ~prev_digit)
+    earlier = np.zeros_like(starts)
+    earlier[:, 1:] = np.logical_or.accumulate(starts, axis=1)[:, :-1]
+    codes[starts & earlier] += SPACED
+
+    text = np.full((n, width + 1), CODE_EOL, dtype=np.int16)
+    text[:, :width] = codes
+    return "".join(PIECES[text.ravel()].tolist()).split("\n")[:n]
+
+# ───────── encoding ─────────
+# the lines are rewritten as text with one character per cell ("0".."9", "/" = -1 blank)
+# using whole-text regex and translate passes, then read into the grid in one frombuffer.
+BLANK_CHAR = chr(ord("0") - 1)
+WORD_RE = re.compile(r"[^\W\d_]+")
+JUNK_RE = re.compile(r"[^0-9+\-*/^()=\n]") # whitespace and anything else the row encoder skips
+OPS_TO_CELLS = str.maketrans({op: str(col) * 2 for op, col in DOUBLE_BY_OP.items()})
+_word_cells = {} #word -> cell characters, filled as words are seen
+
+def word_cells(m):
+    word = m.group()
+    cells = _word_cells.get(word)
+    if cells is None:
+        c = word[0].lower()
+        if word == "VAR": cells = "99"
+        elif c in IDENT_TO_DIGIT: cells = f"9{IDENT_TO_DIGIT[c]}"
+        else: cells = "" # unknown ident → ignored, same as encode_line_to_cells
+        _word_cells[word] = cells
+    return cells
+
+def encode_lines(lines, width=ROW_LEN):
+    """Encode many source lines into an N×width grid, padded with blanks (-1). Numbers must use ASCII digits."""
+    if not lines: return np.full((0, width), -1, dtype=np.int8)
+    text = WORD_RE.sub(word_cells, "\n".join(line.replace("\n", " ") for line in lines))
+    text = JUNK_RE.sub("", text).translate(OPS_TO_CELLS)
+    rows = "".join(row[:width].ljust(width, BLANK_CHAR) for row in text.split("\n"))
+    grid = np.frombuffer(rows.encode("ascii"), dtype=np.uint8).astype(np.int8) - ord("0")
+    return grid.reshape(len(lines), width)
+
+# ───────── benchmark ─────────
+def benchmark(n=20000, seed=77):
+    import time
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(-1, 10, size=(n, ROW_LEN), dtype=np.int8)
+    rows = grid.tolist()
+
+    t = time.perf_counter(); slow = [tokenize_cells_to_source(r) for r in rows]; t_row = time.perf_counter() - t
+    t = time.perf_counter(); fast = decode_grid(grid); t_bulk = time.perf_counter() - t
+    assert slow == fast, "decode_grid disagrees with tokenize_cells_to_source"
+    print(f"decode {n} rows: per-row {t_row:.3f}s  bulk {t_bulk:.3f}s  ({t_row / t_bulk:.1f}x)")
+
+    t = time.perf_counter(); slow = [encode_line_to_cells(s) for s in fast]; t_row = time.perf_counter() - t
+    t = time.perf_counter(); back = encode_lines(fast); t_bulk = time.perf_counter() - t
+    assert slow == back.tolist(), "encode_lines disagrees with encode_line_to_cells"
+    print(f"encode {n} rows: per-row {t_row:.3f}s  bulk {t_bulk:.3f}s  ({t_row / t_bulk:.1f}x)")
+
+if __name__ == "__main__": benchmark()
@@ -0,0 +1,191 @@
+# duck_catalog.py
+# Small append-only index of the .duck programs saved by the notebook.
+# - one line per saved program: name, timestamp, line count, source hash
+# - latest() is O(1), page() walks history newest-first
+# - identical programs are found by hash so they only get saved once
+# - if the directory was changed behind our back the index is rebuilt from the files,
+#   files that aren't valid UTF-8 are skipped
+
+import os, time
+
+INDEX_NAME = ".duck_index"
+COARSE_TICK = 2.0 #seconds, the mtime resolution of the coarsest filesystems (FAT)
+
+def source_hash(src):
+    import hashlib # a few ms to import, only pay for it when a program is actually saved or indexed
+    return hashlib.sha1(src.encode("utf-8")).hexdigest()
+
+def count_lines(src):
+    return sum(1 for ln in src.splitlines() if ln.strip())
+
+class CatalogEntry:
+    def __init__(self, name, ts, lines, hash_):
+        self.name = name
+        self.ts = ts #seconds since epoch, same clock as os.path.getmtime
+        self.lines = lines #non-blank source lines
+        self.hash = hash_ #sha1 of the source text
+
+    def to_line(self):
+        return f"{self.name}\t{self.ts!r}\t{self.lines}\t{self.hash}\n"
+
+    @classmethod
+    def from_line(cls, line):
+        name, ts, lines, hash_ = line.rstrip("\n").split("\t")
+        return cls(name, float(ts), int(lines), hash_)
+
+    def __repr__(self):
+        return f"{self.name}:{self.lines}:{self.hash[:8]}"
+
+class DuckCatalog:
+    """Keeps the list of saved programs in memory, backed by an append-only file in the export folder.
+    Adding or removing a file by hand changes the directory mtime, which triggers a rebuild. Just after
+    a sync the .duck files are also counted, since a coarse mtime may not move for a file added in the same tick.
+    Entries handed out by latest() and page() are checked against their file's mtime, so programs
+    edited in place are re-read. Files that can't be read as UTF-8 are left out of the catalog.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_NAME)
+        self.entries = [] #oldest first, so the latest program is always entries[-1]
+        self.by_hash = {} #source hash -> newest entry with that source
+        self.by_name = {}
+        self.unreadable = 0 #.duck names left out by the last rebuild
+        self.dir_mtime = None #directory mtime_ns when the entries last matched the files
+        self.synced_at = 0.0
+
+        if self.is_stale(): self.rebuild()
+        else: self.load()
+
+    def is_stale(self):
+        if not os.path.exists(self.path): return True
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        if self.dir_mtime is None: #just opened, trust the index only if it was written after the last change
+            return dir_mtime >= os.stat(self.path).st_mtime_ns
+        if dir_mtime != self.dir_mtime: return True
+        if time.time() - self.synced_at < COARSE_TICK:
+            return self.count_files() != len(self.entries) + self.unreadable
+        return False
+
+    def count_files(self):
+        return sum(1 for fn in os.listdir(self.directory) if fn.lower().endswith(".duck"))
+
+    def sync(self): #the entries match the files as of now
+        self.dir_mtime = os.stat(self.directory).st_mtime_ns
+        self.synced_at = time.time()
+
+    def load(self):
+        self.clear()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip(): self.remember(CatalogEntry.from_line(line))
+        except (ValueError, UnicodeDecodeError): #e.g. a last line cut short by a crash, the files are the truth
+            self.rebuild()
+            return
+        self.sync()
+
+    def rebuild(self):
+        """Scan the directory once and rewrite the index from the .duck files on disk."""
+        self.clear()
+        found = []
+        for fn in os.listdir(self.directory):
+            if not fn.lower().endswith(".duck"): continue
+            entry = self.read_entry(fn)
+            if entry: found.append(entry)
+            else: self.unreadable += 1
+        found.sort(key=lambda e: e.ts)
+        for entry in found: self.remember(entry)
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(e.to_line() for e in self.entries)
+        os.replace(tmp, self.path)
+        os.utime(self.path) # the replace itself touched the directory, make the index newer than it
+        self.sync()
+
+    def read_entry(self, name):
+        """A fresh entry for the file, or None if it is gone, a directory or not UTF-8."""
+        path = os.path.join(self.directory, name)
+        try:
+            ts = os.path.getmtime(path)
+            with open(path, "r", encoding="utf-8") as f:
+                src = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        return CatalogEntry(name, ts, count_lines(src), source_hash(src))
+
+    def clear(self):
+        self.entries = []
+        self.by_hash = {}
+        self.by_name = {}
+        self.unreadable = 0
+
+    def remember(self, entry):
+        old = self.by_name.get(entry.name)
+        if old: #the file was rewritten, forget what it used to hold
+            self.entries.remove(old)
+            if self.by_hash.get(old.hash) is old: del self.by_hash[old.hash]
+        self.entries.append(entry)
+        self.by_hash[entry.hash] = entry
+        self.by_name[entry.name] = entry
+
+    def append(self, entry):
+        self.remember(entry)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(entry.to_line())
+
+    def add(self, name, src):
+        """Record a program that was just written to the directory."""
+        entry = CatalogEntry(name, os.path.getmtime(os.path.join(self.directory, name)), count_lines(src), source_hash(src))
+        self.append(entry)
+        self.sync()
+        return entry
+
+    def fresh(self, entry):
+        """entry itself if its file is unchanged, a re-read entry if it was edited in place, None if it is gone."""
+        try:
+            if os.path.getmtime(os.path.join(self.directory, entry.name)) == entry.ts: return entry
+        except OSError:
+            return None
+        new = self.read_entry(entry.name)
+        if new: self.append(new)
+        return new
+
+    def find_source(self, src):
+        """Return the entry of a saved program whose file still holds exactly src, or None."""
+        self.refresh()
+        entry = self.by_hash.get(source_hash(src))
+        if entry is None: return None
+        try:
+            with open(os.path.join(self.directory, entry.name), "r", encoding="utf-8") as f:
+                if f.read() == src: return entry
+        except (OSError, UnicodeDecodeError): #deleted or broken by hand
+            pass
+        return None
+
+    def refresh(self):
+        """Rebuild if files were added or removed behind our back, one stat of the directory otherwise."""
+        if self.is_stale(): self.rebuild()
+
+    def latest(self):
+        self.refresh()
+        if not self.entries: return None
+        entry = self.fresh(self.entries[-1])
+        if entry is None: #deleted or broken by hand, fall back to a rescan
+            self.rebuild()
+            return self.entries[-1] if self.entries else None
+        return entry
+
+    def page(self, page_no, page_size=20):
+        """Entries newest-first, page_no counts from 0."""
+        self.refresh()
+        end = len(self.entries) - page_no * page_size
+        if end <= 0: return []
+        page = self.entries[max(end - page_size, 0):end][::-1]
+        if all(self.fresh(e) is e for e in page): return page
+        self.rebuild() #something on this page changed by hand, rescan so the order is right again
+        end = len(self.entries) - page_no * page_size
+        return self.entries[max(end - page_size, 0):end][::-1] if end > 0 else []
+
+    def __len__(self):
+        return len(self.entries)
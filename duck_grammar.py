@@ -0,0 +1,145 @@
+# duck_grammar.py
+# The colour grammar and .duck persistence of the Duck Notebook, without any UI.
+# Importing this module has no side effects: no pygame, no window, no folders created,
+# so batch tools can use it on machines without a display.
+# - tokenize_cells_to_source / encode_line_to_cells convert between colour rows and source
+# - save_program / read_program / latest_program handle the .duck files in EXPORT_DIR
+
+import os, time
+from duck_catalog import DuckCatalog
+
+ROW_LEN = 24
+
+# ───────── export folder ─────────
+EXPORT_DIR = "duck_programs"
+_catalogs = {} # directory -> DuckCatalog, opened on first save/load
+
+def get_catalog(directory=EXPORT_DIR):
+    cat = _catalogs.get(directory)
+    if cat is None:
+        os.makedirs(directory, exist_ok=True)
+        cat = _catalogs[directory] = DuckCatalog(directory)
+    return cat
+
+# ───────── colour grammar ─────────
+# doubles → tokens
+OP_BY_DOUBLE = {1:"+",2:"-",3:"*",4:"/",5:"^",6:"(",7:")",8:"=",9:"VAR"}
+# 9 + digit → identifier
+IDENT_BY_PAIR = {1:"a",2:"b",3:"c",4:"d",5:"e",6:"f",7:"g",8:"h",9:None}
+# inverse (for loading .duck back into coloured cells)
+DOUBLE_BY_OP = {"+":1, "-":2, "*":3, "/":4, "^":5, "(":6, ")":7, "=":8}
+IDENT_TO_DIGIT = {v:k for k,v in IDENT_BY_PAIR.items() if v}
+
+def cell_tokens(cells):
+    """Split a row of colour cells into tokens, as (source text, first cell, cell after the last)."""
+    toks=[]; i=0; start=0; buf=[]
+    def flush(): 
+        nonlocal buf
+        if buf: toks.append(("".join(buf),start,start+len(buf))); buf=[]
+    while i<len(cells):
+        v=cells[i]; nxt=cells[i+1] if i+1<len(cells) else None
+        if v==-1: flush(); i+=1; continue
+        if v==9 and nxt==9: flush(); toks.append(("VAR",i,i+2)); i+=2; continue
+        if nxt is not None and v==nxt and v in OP_BY_DOUBLE: flush(); toks.append((OP_BY_DOUBLE[v],i,i+2)); i+=2; continue
+        if v==9 and nxt in IDENT_BY_PAIR and IDENT_BY_PAIR[nxt]: flush(); toks.append((IDENT_BY_PAIR[nxt],i,i+2)); i+=2; continue
+        if not buf: start=i
+        buf.append(str(v)); i+=1
+    flush(); return toks
+
+def tokenize_cells_to_source(cells):
+    """Encode a row of colour cells into source using the colour grammar."""
+    return " ".join(tok for tok,_,_ in cell_tokens(cells)).strip()
+
+def encode_line_to_cells(line, width=ROW_LEN):
+    """
+    Convert a plain source line (from .duck) back into a colour row.
+    We keep it simple: tokens are digits, single-letter ids a–h, VAR, and ops + - * / ^ ( ) =
+    """
+    cells=[]
+    i=0
+    line=line.strip()
+    while i < len(line) and len(cells) < width:
+        ch=line[i]
+
+        # whitespace
+        if ch.isspace(): i+=1; continue
+
+        # operators
+        if ch in DOUBLE_BY_OP:
+            col=DOUBLE_BY_OP[ch]
+            cells.extend([col,col])
+            i+=1
+            continue
+
+        # parenthesis/operators already covered; numbers
+        if ch.isdigit():
+            # read a whole number
+            j=i
+            while j<len(line) and line[j].isdigit(): j+=1
+            for d in line[i:j]:
+                cells.append(int(d))
+            i=j
+            continue
+
+        # identifiers (single-letter a..h)
+        if ch.isalpha():
+            # read word
+            j=i
+            while j<len(line) and line[j].isalpha(): j+=1
+            word=line[i:j]
+            if word=="VAR":
+                cells.extend([9,9])
+            else:
+                # take first character; if it's a..h, map to 9 + digit
+                c=word[0].lower()
+                if c in IDENT_TO_DIGIT:
+                    cells.extend([9, IDENT_TO_DIGIT[c]])
+                else:
+                    # unknown ident → we’ll just ignore (or you can place blanks)
+                    pass
+            i=j
+            continue
+
+        # anything else → skip
+        i+=1
+
+    # pad to width with blanks
+    if len(cells) < width:
+        cells.extend([-1]*(width-len(cells)))
+    else:
+        cells=cells[:width]
+    return cells
+
+# ───────── .duck files ─────────
+def save_program(src, directory=EXPORT_DIR):
+    """Write src as <timestamp>.duck (or <timestamp>_N.duck if that is taken) into directory.
+    Returns (path, None) for a new file, or (None, entry) if an identical program is already saved."""
+    src=src+"\n"
+    cat=get_catalog(directory)
+    same=cat.find_source(src)
+    if same: return None, same
+    now=time.time()
+    stem=time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+    n=0
+    while True: # a second save in the same second gets _1, _2, ... instead of overwriting
+        fname=f"{stem}_{n}.duck" if n else stem+".duck"
+        path=os.path.join(directory,fname)
+        try:
+            with open(path,"x",encoding="utf-8") as f:
+                f.write(src)
+            break
+        except FileExistsError:
+            n+=1
+    cat.add(fname,src)
+    return path, None
+
+def read_program(path, width=ROW_LEN):
+    """Read a .duck file back into rows of {"cells", "text"}, skipping blank lines."""
+    with open(path,"r",encoding="utf-8") as f:
+        lines=[ln.rstrip("\n") for ln in f.readlines()]
+    return [{"cells":encode_line_to_cells(ln, width=width), "text":ln} for ln in lines if ln.strip()]
+
+def latest_program(directory=EXPORT_DIR):
+    """Path of the most recent .duck in directory (from the catalog), or None."""
+    entry=get_catalog(directory).latest()
+    return os.path.join(directory, entry.name) if entry else None
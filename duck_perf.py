@@ -0,0 +1,156 @@
+# duck_perf.py
+# Frame timing and input replay for the notebook in token_bridge.py.
+# - FrameStats : per-phase time of every frame, FPS and frame-time percentiles
+# - EventRecorder / EventReplayer : write the pygame input of a session to a .jsonl file
+#   and feed it back frame by frame, so the same session can be replayed headless as a benchmark
+# FrameStats does not need pygame, the recorder and replayer import it when they are created.
+
+import json, math
+from collections import deque
+from time import perf_counter
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list, p in 0..100."""
+    if not sorted_values: return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+class Phase:
+    """One timed section, used as `with stats.phase("draw_row"):`.
+    Phases can nest, the time of an inner phase is not counted again in the outer one."""
+    __slots__ = ("stats", "name", "t0", "inner")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.inner = 0.0
+        self.stats.stack.append(self)
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = perf_counter() - self.t0
+        stack = self.stats.stack
+        stack.pop()
+        if stack: stack[-1].inner += dt
+        current = self.stats.current
+        current[self.name] = current.get(self.name, 0.0) + dt - self.inner
+        return False
+
+class FrameStats:
+    """Collects the work time of each frame and of each named phase inside it.
+    Only the last `window` frames are kept, window=None keeps every frame (for benchmarks)."""
+    def __init__(self, window=600):
+        self.window = window
+        self.frames = deque(maxlen=window) #work time of each frame in seconds, not counting the wait in clock.tick
+        self.starts = deque(maxlen=window) #perf_counter at the start of each frame, for FPS
+        self.phases = {} #phase name -> deque of its time in each frame, aligned with frames
+        self.current = {}
+        self.stack = []
+        self.count = 0
+        self.t0 = None
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def start_frame(self):
+        self.current = {}
+        self.t0 = perf_counter()
+        self.starts.append(self.t0)
+
+    def end_frame(self):
+        self.frames.append(perf_counter() - self.t0)
+        for name in self.current:
+            if name not in self.phases: #zero for every earlier frame so all the deques stay aligned
+                self.phases[name] = deque([0.0] * (len(self.frames) - 1), maxlen=self.window)
+        for name, times in self.phases.items():
+            times.append(self.current.get(name, 0.0))
+        self.count += 1
+
+    def fps(self):
+        if len(self.starts) < 2: return 0.0
+        return (len(self.starts) - 1) / (self.starts[-1] - self.starts[0])
+
+    def summary(self):
+        """Dict with fps, frame-time percentiles and the mean / max of every phase, all times in ms."""
+        frames = sorted(self.frames)
+        out = {"frames": len(frames), "fps": self.fps()}
+        for p in (50, 95, 99): out[f"p{p}_ms"] = percentile(frames, p) * 1000
+        out["max_ms"] = frames[-1] * 1000 if frames else 0.0
+        out["phases"] = {name: {"mean_ms": sum(times) / len(times) * 1000, "max_ms": max(times) * 1000}
+                         for name, times in self.phases.items() if times}
+        return out
+
+    def lines(self):
+        """Short text lines for the on-screen overlay."""
+        s = self.summary()
+        out = [f"{s['fps']:5.1f} fps   frame p50 {s['p50_ms']:.2f}  p95 {s['p95_ms']:.2f}  p99 {s['p99_ms']:.2f} ms"]
+        for name, t in sorted(s["phases"].items(), key=lambda kv: -kv[1]["mean_ms"]):
+            out.append(f"{name:<20} {t['mean_ms']:6.2f} ms  max {t['max_ms']:6.2f}")
+        return out
+
+    def report(self):
+        s = self.summary()
+        return "\n".join([f"{s['frames']} frames, max {s['max_ms']:.2f} ms"] + self.lines())
+
+# ───────── input recording ─────────
+# one JSON object per event: {"frame": n, "type": "KEYDOWN", "key": ..., ...}
+# the last line is {"frame": n, "type": "END"} so a replay lasts exactly as many frames as the recording
+EVENT_FIELDS = {
+    "QUIT": (),
+    "KEYDOWN": ("key", "mod", "unicode", "scancode"),
+    "MOUSEBUTTONDOWN": ("pos", "button"),
+}
+
+class EventRecorder:
+    def __init__(self, path):
+        import pygame
+        self.types = {getattr(pygame, name): name for name in EVENT_FIELDS}
+        self.file = open(path, "w", encoding="utf-8")
+        self.frame = 0
+
+    def record(self, events):
+        """Write the events handled in this frame, call once per frame even when there are none."""
+        for e in events:
+            name = self.types.get(e.type)
+            if name is None: continue #only the events the notebook reacts to
+            record = {"frame": self.frame, "type": name}
+            for field in EVENT_FIELDS[name]: record[field] = getattr(e, field, None)
+            self.file.write(json.dumps(record) + "\n")
+        self.frame += 1
+
+    def close(self):
+        self.file.write(json.dumps({"frame": self.frame, "type": "END"}) + "\n")
+        self.file.close()
+
+class EventReplayer:
+    def __init__(self, path):
+        import pygame
+        self.pygame = pygame
+        self.by_frame = {}
+        self.last_frame = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                self.last_frame = max(self.last_frame, record["frame"])
+                if record["type"] == "END": continue
+                self.by_frame.setdefault(record["frame"], []).append(record)
+        self.frame = 0
+
+    @property
+    def done(self):
+        return self.frame >= self.last_frame
+
+    def next_frame(self):
+        """pygame events recorded for the next frame."""
+        pygame = self.pygame
+        events = []
+        for record in self.by_frame.get(self.frame, ()):
+            attrs = {field: record.get(field) for field in EVENT_FIELDS[record["type"]]}
+            if attrs.get("pos") is not None: attrs["pos"] = tuple(attrs["pos"])
+            events.append(pygame.event.Event(getattr(pygame, record["type"]), attrs))
+        self.frame += 1
+        return events
@@ -0,0 +1,108 @@
+# duck_watch.py
+# Watches the notebook's export folder and re-runs the .duck programs that change.
+# - polls the folder with os.scandir; a file with the same mtime and size as last time is never opened
+# - a file that did change is read and hashed, and only run if its source really is different
+# - all programs go through one shared interpreter, each on its own fork of one base symbol table
+# - results are JSON lines, the same records as `shell.py --jsonl` plus an "event" field
+#   (added / modified, and {"file", "event": "removed"} for deleted programs)
+# - a program that can't be read or crashes the interpreter gives {"file", "event", "error"} and watching goes on
+# Run: python duck_watch.py [directory] [--interval seconds] [--once] [--new-only]
+
+import argparse, contextlib, io, json, os, sys, time
+import basic
+from duck_catalog import source_hash
+from duck_grammar import EXPORT_DIR
+from shell import statement_record
+
+class DuckWatcher:
+    def __init__(self, directory=EXPORT_DIR, interpreter=None, prelude=None):
+        self.directory = directory
+        self.interpreter = interpreter or basic.Interpreter()
+        self.prelude = prelude or basic.make_global_symbol_table(basic.PersistentSymbolTable())
+        self.files = {} #name -> (mtime_ns, size, source hash or None if never read)
+
+    def stat_all(self):
+        """Yield (name, stat) of every .duck file, one stat call per file and no reads."""
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(".duck") and entry.is_file():
+                    yield entry.name, entry.stat()
+
+    def prime(self):
+        """Take the files already there as seen without reading them, so only later changes are run."""
+        for name, st in self.stat_all():
+            self.files[name] = (st.st_mtime_ns, st.st_size, None)
+
+    def scan(self):
+        """Compare the folder against the last scan. Returns (event, name, source, error) sorted by name,
+        source is None for removed files and for files that could not be decoded (error says why)."""
+        changes = []
+        seen = set()
+        for name, st in self.stat_all():
+            seen.add(name)
+            old = self.files.get(name)
+            if old and old[0] == st.st_mtime_ns and old[1] == st.st_size: continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    src = f.read()
+            except UnicodeDecodeError as e: #not read again until it changes, and run once it is fixed
+                self.files[name] = (st.st_mtime_ns, st.st_size, None)
+                changes.append(("modified" if old else "added", name, None, f"not UTF-8: {e}"))
+                continue
+            except OSError: #deleted between the scandir and the open, the next scan reports it
+                continue
+            hash_ = source_hash(src)
+            self.files[name] = (st.st_mtime_ns, st.st_size, hash_)
+            if old and old[2] == hash_: continue #only touched, or saved again unchanged
+            changes.append(("modified" if old else "added", name, src, None))
+
+        for name in self.files.keys() - seen:
+            del self.files[name]
+            changes.append(("removed", name, None, None))
+        changes.sort(key=lambda c: c[1])
+        return changes
+
+    def run(self, name, src):
+        """Run one program statement by statement on a fresh fork of the prelude, yields (value, error)."""
+        path = os.path.join(self.directory, name)
+        return basic.run_stream(path, io.StringIO(src), self.interpreter, self.prelude.fork())
+
+def watch(directory=EXPORT_DIR, interval=1.0, once=False, new_only=False):
+    """Poll the folder every `interval` seconds and write one JSON line per statement of every changed program."""
+    watcher = DuckWatcher(directory)
+    if new_only: watcher.prime()
+    out = open(sys.stdout.fileno(), "w", encoding="utf-8", buffering=1 << 16, closefd=False)
+
+    with out, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # silence the interpreter's debug prints
+        try:
+            while True:
+                for event, name, src, problem in watcher.scan():
+                    path = os.path.join(directory, name)
+                    if src is None:
+                        record = {"file": path, "event": event}
+                        if problem: record["error"] = problem
+                        out.write(json.dumps(record) + "\n")
+                        continue
+                    try:
+                        for n, (value, error) in enumerate(watcher.run(name, src), 1):
+                            record = statement_record(path, n, value, error)
+                            record["event"] = event
+                            out.write(json.dumps(record) + "\n")
+                    except Exception as e: # one bad program must not stop the watcher
+                        out.write(json.dumps({"file": path, "event": event, "error": f"{type(e).__name__}: {e}"}) + "\n")
+                out.flush()
+                if once: return 0
+                time.sleep(interval)
+        except KeyboardInterrupt: # Ctrl-C stops watching
+            return 0
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Re-run .duck programs whenever they are added or changed, writing JSON lines.")
+    arg_parser.add_argument("directory", nargs="?", default=EXPORT_DIR, help=f"folder to watch (default {EXPORT_DIR})")
+    arg_parser.add_argument("--interval", type=float, default=1.0, help="seconds between polls")
+    arg_parser.add_argument("--once", action="store_true", help="scan and run once, then exit")
+    arg_parser.add_argument("--new-only", action="store_true", help="do not run the programs already there at startup")
+    args = arg_parser.parse_args(argv)
+    return watch(args.directory, args.interval, args.once, args.new_only)
+
+if __name__ == "__main__": sys.exit(main())
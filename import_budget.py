@@ -0,0 +1,35 @@
+# import_budget.py
+# Checks that the headless modules stay cheap to import, measured with `python -X importtime`.
+# Run: python import_budget.py   (exits 1 if a module goes over its budget)
+
+import os, subprocess, sys
+
+# cumulative import time in microseconds, including everything the module pulls in
+BUDGETS_US = {
+    "basic": 3000,
+    "duck_grammar": 2000,
+}
+
+def import_time_us(module):
+    """Cumulative import time of module in a fresh interpreter, as reported by -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module and not parts[2].startswith("  "):
+            return int(parts[1])
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+def main(repeat=5):
+    ok = True
+    for module, budget in BUDGETS_US.items():
+        best = min(import_time_us(module) for _ in range(repeat)) #best of a few runs, the first one may also compile
+        status = "ok" if best <= budget else "OVER BUDGET"
+        if best > budget: ok = False
+        print(f"{module:<14} {best / 1000:6.2f} ms  (budget {budget / 1000:.2f} ms)  {status}")
+    return 0 if ok else 1
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,46 @@
+# intern_memory.py
+# Memory benchmark for NodeInterner: parses a corpus of colour-grammar programs twice, once as
+# ordinary trees and once with a shared interner, keeps every tree alive and compares the
+# memory tracemalloc sees for each (the interned numbers include the parsers' span side tables).
+# Run: python intern_memory.py [programs]
+
+import random, sys, tracemalloc
+import basic
+
+def make_corpus(n, seed=11):
+    """Lines like the notebook produces: digits, single letter names a-h, VAR and + - * / ^ ( )."""
+    rng = random.Random(seed)
+    def expr(depth=0):
+        if depth > 2 or rng.random() < 0.35:
+            return rng.choice(["a", "b", "c", "d", "e", "f", "g", "h", str(rng.randint(0, 20))])
+        if rng.random() < 0.1: return f"-{expr(depth + 1)}"
+        return f"({expr(depth + 1)} {rng.choice('+-*/^')} {expr(depth + 1)})"
+    return [f"VAR {rng.choice('abcdefgh')} = {expr()}" if rng.random() < 0.5 else expr() for _ in range(n)]
+
+def parse_all(corpus, interner=None):
+    trees, spans = [], []
+    for i, line in enumerate(corpus):
+        tokens, error = basic.Lexer(f"<{i}>", line).make_tokens()
+        parser = basic.Parser(tokens, interner)
+        res = parser.parse()
+        if res.error: raise RuntimeError(res.error.as_string())
+        trees.append(res.node)
+        spans.append(parser.spans)
+    return trees, spans
+
+def measure(corpus, interner=None):
+    tracemalloc.start()
+    kept = parse_all(corpus, interner)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, kept
+
+def main(n=20000):
+    corpus = make_corpus(n)
+    plain, _ = measure(corpus)
+    interner = basic.NodeInterner()
+    interned, _ = measure(corpus, interner)
+    print(f"{n} programs: plain trees {plain / 2**20:.1f} MiB, interned {interned / 2**20:.1f} MiB "
+          f"({100 * (1 - interned / plain):.0f}% less, {len(interner)} shared tokens and nodes)")
+
+if __name__ == "__main__": main(*map(int, sys.argv[1:]))
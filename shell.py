@@ -1,11 +1,82 @@
 import basic
+import argparse, contextlib, json, os, sys
 
-while True:
-    text = input("basic-shell> ")
-    result, error = basic.run("<stdin>",text)
-    
-    if error:
-        print(error.as_string())
-    else:
-        print(result)
-    
+def interactive():
+    while True:
+        try:
+            text = input("basic-shell> ")
+        except (EOFError, KeyboardInterrupt): # Ctrl-D / Ctrl-C leaves the shell
+            print()
+            return 0
+        result, error = basic.run("<stdin>",text)
+
+        if error:
+            print(error.as_string())
+        else:
+            print(result)
+
+def statement_record(fn, n, value, error):
+    """The JSON object written for one statement with --jsonl."""
+    record = {"file": fn, "statement": n}
+    if error: record.update(error=error.error_name, details=error.details, message=error.as_string())
+    else: record["value"] = value
+    return record
+
+def batch(paths, jsonl=False, fail_fast=False, cse=False):
+    """Run every line of the given files (or of stdin) as a statement in one shared session.
+    Results go through one buffered writer, the interpreter's debug prints are silenced.
+    Returns the exit status: 0 if every statement ran, 1 if any failed.
+    With cse, repeated subexpressions are reused and the saved evaluations are reported on stderr."""
+    interpreter = basic.CSEInterpreter() if cse else basic.Interpreter()
+    symbol_table = basic.make_global_symbol_table()
+    out = open(sys.stdout.fileno(), "w", encoding="utf-8", buffering=1 << 16, closefd=False)
+    status = 0
+
+    with out, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for path in paths or ["-"]:
+            fn = "<stdin>" if path == "-" else path
+            try:
+                stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+            except OSError as e: # missing or unreadable file, report it and go on with the next one
+                out.flush()
+                print(f"{path}: {e.strerror or e}", file=sys.stderr)
+                status = 1
+                if fail_fast: break
+                continue
+            with contextlib.ExitStack() as stack:
+                if stream is not sys.stdin: stack.enter_context(stream)
+
+                try:
+                    for n, (value, error) in enumerate(basic.run_stream(fn, stream, interpreter, symbol_table), 1):
+                        if jsonl:
+                            out.write(json.dumps(statement_record(fn, n, value, error)) + "\n")
+                        else:
+                            out.write((error.as_string() if error else str(value)) + "\n")
+
+                        if error:
+                            status = 1
+                            if fail_fast: break
+                except (OSError, UnicodeDecodeError) as e: # the file went bad half way through reading it
+                    out.flush()
+                    print(f"{path}: {e}", file=sys.stderr)
+                    status = 1
+                if status and fail_fast: break
+
+    if cse:
+        stats = interpreter.stats
+        print(f"cse: {stats['evaluated']} subexpressions evaluated, {stats['reused']} reused, {stats['saved']} node evaluations saved", file=sys.stderr)
+    return status
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="BASIC shell. With files or piped input it runs them in batch mode, one statement per line.")
+    arg_parser.add_argument("files", nargs="*", help="program files to run in order, - for stdin")
+    arg_parser.add_argument("--jsonl", action="store_true", help="write one JSON object per statement")
+    arg_parser.add_argument("--fail-fast", action="store_true", help="stop at the first error")
+    arg_parser.add_argument("--cse", action="store_true", help="reuse repeated subexpressions and report how many evaluations that saved")
+    args = arg_parser.parse_args(argv)
+
+    if not args.files and sys.stdin.isatty():
+        return interactive()
+    return batch(args.files, args.jsonl, args.fail_fast, args.cse)
+
+if __name__ == "__main__": sys.exit(main())
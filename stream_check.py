@@ -0,0 +1,42 @@
+# stream_check.py
+# Regression check for run_stream on broken input: every bad line is reported once
+# and the lines after it still run. Illegal characters right after an operator used to
+# leave the parser waiting on that operator forever (RecursionError), and 0 ^ -1 or an
+# overflowing power raised out of the interpreter.
+# Run: python stream_check.py
+
+import contextlib, io, os, sys
+import basic
+
+CASES = [
+    # source, expected per statement: a value or the error name
+    ("1 + $\n3\n", ["Illegal Character", 3]),
+    ("2 ^ ?\n3\n", ["Illegal Character", 3]),
+    ("-?\n3\n", ["Illegal Character", 3]),
+    ("2 * (1 - #\n3\n", ["Illegal Character", 3]),
+    ("VAR a = @\na\n", ["Illegal Character", "Runtime Error"]),
+    ("1 $\n3\n", ["Illegal Character", 3]),
+    ("1 +\n3\n", ["Invalid Syntax", 3]),
+    ("1 + 1\n$\n", [2, "Illegal Character"]),
+    ("0 ^ -1\n3\n", ["Runtime Error", 3]),
+    ("2.0 ^ 10000\n3\n", ["Runtime Error", 3]),
+]
+
+def outcomes(src):
+    out = []
+    for value, error in basic.run_stream("<check>", io.StringIO(src), symbol_table=basic.make_global_symbol_table()):
+        out.append(error.error_name if error else value)
+    return out
+
+def main():
+    failed = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # silence the interpreter's debug prints
+        for src, expected in CASES:
+            got = outcomes(src)
+            if got != expected:
+                failed += 1
+                print(f"FAIL {src!r}: expected {expected}, got {got}", file=sys.stderr)
+    print(f"{len(CASES) - failed}/{len(CASES)} stream cases ok", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,75 @@
+# thread_stress.py
+# Runs the same batch of jobs serially and on a thread pool sharing one interpreter,
+# and checks the results are identical. The programs are parsed once and every job executes
+# those same trees, so threads run (and an AdaptiveInterpreter quickens) shared nodes at the
+# same time. Each job forks an int or a float prelude, so the operand types at a site keep
+# switching and quickened handlers are replaced while other threads are using them.
+# Run: python thread_stress.py [jobs] [threads]
+
+import contextlib, os, random, sys
+from concurrent.futures import ThreadPoolExecutor
+import basic
+
+NAMES = "abcdefgh"
+N_PROGRAMS = 40
+
+def make_programs(n, seed=7):
+    rng = random.Random(seed)
+    def expr(depth=0):
+        if depth > 3 or rng.random() < 0.3:
+            return rng.choice([str(rng.randint(0, 9)), f"{rng.randint(0, 9)}.5", rng.choice(NAMES), f"-{rng.choice(NAMES)}"])
+        return f"({expr(depth + 1)} {rng.choice('+-*/')} {expr(depth + 1)})"
+    return [[f"VAR {rng.choice(NAMES)} = {expr()}" if rng.random() < 0.5 else expr() for _ in range(8)] for _ in range(n)]
+
+def parse_programs(programs):
+    trees = []
+    for i, program in enumerate(programs):
+        parsed = []
+        for j, line in enumerate(program):
+            node, error = basic.parse(f"<program {i} line {j}>", line)
+            if error: raise RuntimeError(error.as_string())
+            parsed.append(node)
+        trees.append(parsed)
+    return trees
+
+def make_jobs(n, seed=7):
+    """(program, prelude) pairs, the same program comes up many times with both preludes."""
+    rng = random.Random(seed)
+    return [(rng.randrange(N_PROGRAMS), rng.randrange(2)) for _ in range(n)]
+
+def make_preludes():
+    preludes = []
+    for kind in (int, float): # same names, int values in one and float values in the other
+        prelude = basic.make_global_symbol_table(basic.PersistentSymbolTable())
+        for i, name in enumerate(NAMES): prelude.set(name, basic.Number(kind(i + 1)))
+        preludes.append(prelude)
+    return preludes
+
+def run_job(job, trees, interpreter, preludes):
+    program, prelude = job
+    table = preludes[prelude].fork()
+    out = []
+    for tree in trees[program]:
+        value, error = basic.execute(tree, interpreter, table)
+        out.append(error.as_string() if error else repr(value))
+    return out
+
+def main(n_jobs=1000, threads=8):
+    programs = make_programs(N_PROGRAMS)
+    jobs = make_jobs(n_jobs)
+    ok = True
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # silence the interpreter's debug prints
+        preludes = make_preludes()
+        for interpreter in (basic.Interpreter(), basic.AdaptiveInterpreter()):
+            trees = parse_programs(programs) # fresh trees per run, so both start unquickened
+            serial = [run_job(job, trees, interpreter, preludes) for job in jobs]
+            trees = parse_programs(programs)
+            with ThreadPoolExecutor(threads) as pool:
+                threaded = list(pool.map(lambda job: run_job(job, trees, interpreter, preludes), jobs))
+            same = serial == threaded
+            ok = ok and same
+            extra = f" ({interpreter.stats})" if isinstance(interpreter, basic.AdaptiveInterpreter) else ""
+            print(f"{type(interpreter).__name__}: {n_jobs} jobs on {threads} threads {'identical' if same else 'DIFFERENT'} to serial{extra}", file=sys.stderr)
+    return 0 if ok else 1
+
+if __name__ == "__main__": sys.exit(main(*map(int, sys.argv[1:])))
@@ -11,18 +11,23 @@
 # - R runs all saved rows through basic.py
 # - S saves to duck_programs/<timestamp>.duck
 # - O loads the most-recent .duck from duck_programs/ (reconstructs colours)
+# - H toggles the heat overlay: R then profiles the run and tints the saved cells by run time
+# - F toggles the frame-time overlay (FPS, time per phase, frame-time percentiles)
 # - Q quits
+# Command line: --record FILE saves the input of the session, --replay FILE plays it back
+# (add --headless to replay without a window and print the frame-time report, as a benchmark)
 
-import os, datetime
+import os, sys, argparse
 import pygame, math, random
-from basic import run   # your interpreter: run(fn, src) -> (value, err)
+from basic import run, Interpreter, Lexer, Profiler, TT_EOF   # your interpreter: run(fn, src) -> (value, err)
+from duck_grammar import ROW_LEN, cell_tokens, tokenize_cells_to_source, save_program, read_program, latest_program
+from duck_perf import FrameStats, EventRecorder, EventReplayer
 
 # ───────── window / layout ─────────
 W, H = 1280, 740
 FPS = 60
 
 CELL = 36
-ROW_LEN = 24
 GRID_X = 40
 GRID_Y = 200
 
@@ -31,17 +36,18 @@ SAVED_X = GRID_X + ROW_LEN * CELL + GAP
 SAVED_W = 320
 SAVED_Y = GRID_Y - 24
 
-# ───────── export folder ─────────
-EXPORT_DIR = "duck_programs"
-os.makedirs(EXPORT_DIR, exist_ok=True)
+# ───────── window, set up by init_ui() when the notebook starts ─────────
+screen = clock = font = font_s = font_tiny = None
 
-pygame.init()
-screen = pygame.display.set_mode((W, H))
-pygame.display.set_caption("Duck Notebook — colour grammar")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("Comic Sans MS", 22)
-font_s = pygame.font.SysFont("Comic Sans MS", 16)
-font_tiny = pygame.font.SysFont("Comic Sans MS", 12)
+def init_ui():
+    global screen, clock, font, font_s, font_tiny
+    pygame.init()
+    screen = pygame.display.set_mode((W, H))
+    pygame.display.set_caption("Duck Notebook — colour grammar")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("Comic Sans MS", 22)
+    font_s = pygame.font.SysFont("Comic Sans MS", 16)
+    font_tiny = pygame.font.SysFont("Comic Sans MS", 12)
 
 # ───────── palette ─────────
 PAPER  = (245, 242, 236)
@@ -107,93 +113,12 @@ def draw_duck(surf,x,y,dt,heading=1):
     scribble_line(surf,beak[0],beak[1]); scribble_line(surf,beak[1],beak[2]); scribble_line(surf,beak[2],beak[0])
     scribble_line(surf,(x-6,y+16),(x-12,y+22)); scribble_line(surf,(x+8,y+16),(x+14,y+22))
 
-# ───────── colour grammar ─────────
-# doubles → tokens
-OP_BY_DOUBLE = {1:"+",2:"-",3:"*",4:"/",5:"^",6:"(",7:")",8:"=",9:"VAR"}
-# 9 + digit → identifier
-IDENT_BY_PAIR = {1:"a",2:"b",3:"c",4:"d",5:"e",6:"f",7:"g",8:"h",9:None}
-# inverse (for loading .duck back into coloured cells)
-DOUBLE_BY_OP = {"+":1, "-":2, "*":3, "/":4, "^":5, "(":6, ")":7, "=":8}
-IDENT_TO_DIGIT = {v:k for k,v in IDENT_BY_PAIR.items() if v}
-
-def tokenize_cells_to_source(cells):
-    """Encode a row of colour cells into source using the colour grammar."""
-    src=[]; i=0; buf=[]
-    def flush(): 
-        nonlocal buf
-        if buf: src.append("".join(buf)); buf=[]
-    while i<len(cells):
-        v=cells[i]; nxt=cells[i+1] if i+1<len(cells) else None
-        if v==-1: flush(); i+=1; continue
-        if v==9 and nxt==9: flush(); src.append("VAR"); i+=2; continue
-        if nxt is not None and v==nxt and v in OP_BY_DOUBLE: flush(); src.append(OP_BY_DOUBLE[v]); i+=2; continue
-        if v==9 and nxt in IDENT_BY_PAIR and IDENT_BY_PAIR[nxt]: flush(); src.append(IDENT_BY_PAIR[nxt]); i+=2; continue
-        buf.append(str(v)); i+=1
-    flush(); return " ".join(src).strip()
-
-def encode_line_to_cells(line, width=ROW_LEN):
-    """
-    Convert a plain source line (from .duck) back into a colour row.
-    We keep it simple: tokens are digits, single-letter ids a–h, VAR, and ops + - * / ^ ( ) =
-    """
-    cells=[]
-    i=0
-    line=line.strip()
-    while i < len(line) and len(cells) < width:
-        ch=line[i]
-
-        # whitespace
-        if ch.isspace(): i+=1; continue
-
-        # operators
-        if ch in DOUBLE_BY_OP:
-            col=DOUBLE_BY_OP[ch]
-            cells.extend([col,col])
-            i+=1
-            continue
-
-        # parenthesis/operators already covered; numbers
-        if ch.isdigit():
-            # read a whole number
-            j=i
-            while j<len(line) and line[j].isdigit(): j+=1
-            for d in line[i:j]:
-                cells.append(int(d))
-            i=j
-            continue
-
-        # identifiers (single-letter a..h)
-        if ch.isalpha():
-            # read word
-            j=i
-            while j<len(line) and line[j].isalpha(): j+=1
-            word=line[i:j]
-            if word=="VAR":
-                cells.extend([9,9])
-            else:
-                # take first character; if it's a..h, map to 9 + digit
-                c=word[0].lower()
-                if c in IDENT_TO_DIGIT:
-                    cells.extend([9, IDENT_TO_DIGIT[c]])
-                else:
-                    # unknown ident → we’ll just ignore (or you can place blanks)
-                    pass
-            i=j
-            continue
-
-        # anything else → skip
-        i+=1
-
-    # pad to width with blanks
-    if len(cells) < width:
-        cells.extend([-1]*(width-len(cells)))
-    else:
-        cells=cells[:width]
-    return cells
-
 # ───────── state ─────────
 grid=[-1]*ROW_LEN; cursor=0; duck_heading=1
 saved_rows=[]; toast="paint a row; press Enter to save"; output_lines=[]
+heat_mode=False
+HEAT=(255,60,40)
+stats=FrameStats(); stats_mode=False; stats_lines=[]
 
 def program_source():
     return "\n".join(r["text"] for r in saved_rows if r["text"])
@@ -220,51 +145,83 @@ def run_program():
     global toast,output_lines
     src=program_source()
     if not src.strip(): toast="no program"; return
-    value,err=run("<duck>",src)
+    with stats.phase("run"):
+        if heat_mode:
+            profiler=Profiler()
+            value,err=run("<duck>",src,profiler.attach(Interpreter()))
+            apply_heat(profiler)
+        else:
+            value,err=run("<duck>",src)
     if err:
         msg=getattr(err,"as_string",lambda: str(err))()
     else:
         msg=str(value)
     output_lines.append(msg); toast="ran program"
 
+def toggle_heat():
+    global heat_mode,toast
+    heat_mode=not heat_mode
+    if not heat_mode:
+        for row in saved_rows: row.pop("heat",None)
+    toast="heat overlay on (R to profile)" if heat_mode else "heat overlay off"
+
+def toggle_stats():
+    global stats_mode,toast
+    stats_mode=not stats_mode
+    toast="frame-time overlay on" if stats_mode else "frame-time overlay off"
+
+def apply_heat(profiler):
+    """Spread each profiled span's own time over the cells of the tokens it covers, scaled to 0..1 per program."""
+    rows=[r for r in saved_rows if r["text"]] # same rows, same order as program_source()
+    heat=[[0.0]*len(r["cells"]) for r in rows]
+    # the k-th token of a row's text was painted by the k-th token of its cells, as long as the text lexes
+    # to the same tokens as the cells do; rows loaded with O can hold things the cells can't (other names,
+    # text past ROW_LEN), those get no heat rather than heat on the wrong cells
+    toks=[]
+    for r in rows:
+        lexed,err=Lexer("<duck>",r["text"]).make_tokens()
+        painted,err2=Lexer("<duck>",tokenize_cells_to_source(r["cells"])).make_tokens()
+        same=not err and not err2 and [(t.type,t.value) for t in lexed]==[(t.type,t.value) for t in painted]
+        toks.append(list(zip(lexed,cell_tokens(r["cells"]))) if same else [])
+    for span in profiler.spans.values():
+        ps,pe=span.pos_start,span.pos_end
+        hit=[]
+        for ln in range(ps.ln,min(pe.ln,len(rows)-1)+1):
+            c0=ps.col if ln==ps.ln else 0
+            c1=pe.col if ln==pe.ln else len(rows[ln]["text"])
+            hit+=[(ln,cells) for tok,cells in toks[ln] if tok.type!=TT_EOF and tok.pos_start.col<c1 and tok.pos_end.col>c0]
+        for ln,(_,first,end) in hit:
+            for c in range(first,end): heat[ln][c]+=span.self_time/len(hit)/(end-first)
+    top=max((h for row in heat for h in row),default=0) or 1
+    for r,h in zip(rows,heat): r["heat"]=[v/top for v in h]
+
 def save_duck():
-    """Save current program as a .duck file into EXPORT_DIR with timestamp."""
+    """Save current program as a .duck file into duck_grammar.EXPORT_DIR with timestamp."""
     global toast
     src=program_source()
     if not src.strip():
         toast="nothing to save"
         return
-    ts=datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname=f"{ts}.duck"
-    path=os.path.join(EXPORT_DIR,fname)
     try:
-        with open(path,"w",encoding="utf-8") as f:
-            f.write(src+"\n")
-        toast=f"saved {os.path.join(EXPORT_DIR,fname)}"
+        path,same=save_program(src)
+        if same:
+            toast=f"already saved as {same.name}"
+            return
+        toast=f"saved {path}"
         output_lines.append(f"saved → {path}")
     except Exception as e:
         toast=f"save error: {e}"
 
 def load_latest_duck():
-    """Load the most recent .duck from EXPORT_DIR and rebuild coloured rows."""
-    global toast, saved_rows
+    """Load the most recent .duck from duck_grammar.EXPORT_DIR and rebuild coloured rows."""
+    global toast
     try:
-        files=[f for f in os.listdir(EXPORT_DIR) if f.lower().endswith(".duck")]
-        if not files:
+        path=latest_program()
+        if not path:
             toast="no .duck files"
             return
-        files.sort(key=lambda fn: os.path.getmtime(os.path.join(EXPORT_DIR,fn)), reverse=True)
-        path=os.path.join(EXPORT_DIR, files[0])
-        with open(path,"r",encoding="utf-8") as f:
-            lines=[ln.rstrip("\n") for ln in f.readlines()]
-        # rebuild saved_rows
-        saved_rows.clear()
-        for ln in lines:
-            if not ln.strip(): 
-                continue
-            cells=encode_line_to_cells(ln, width=ROW_LEN)
-            saved_rows.append({"cells":cells, "text":ln})
-        toast=f"loaded {files[0]} ({len(saved_rows)} lines)"
+        saved_rows[:]=read_program(path)
+        toast=f"loaded {os.path.basename(path)} ({len(saved_rows)} lines)"
         output_lines.append(f"loaded ← {path}")
     except Exception as e:
         toast=f"load error: {e}"
@@ -274,7 +231,7 @@ def draw_header():
     screen.blit(font.render("Duck Notebook — colour grammar",True,INK),(GRID_X,GRID_Y-68))
     screen.blit(
         font_s.render(
-            "Space cycle • 0–9 set • Backspace blank • C clear • Enter save • Click saved to load • R run • S save .duck • O load latest • Q quit",
+            "Space cycle • 0–9 set • Backspace blank • C clear • Enter save • Click saved to load • R run • H heat • F stats • S save .duck • O load latest • Q quit",
             True, INK),
         (GRID_X,GRID_Y-44)
     )
@@ -299,6 +256,9 @@ def draw_program_panel():
         for c,v in enumerate(row["cells"][: int((SAVED_W-20)/(mini+2))]):
             cell=(SAVED_X+8+c*(mini+2),y,mini,mini)
             pygame.draw.rect(screen,PALETTE[v],cell); pygame.draw.rect(screen,GRID_LINE,cell,1)
+            if row.get("heat") and c<len(row["heat"]) and row["heat"][c]>0:
+                tint=pygame.Surface((mini,mini),pygame.SRCALPHA); tint.fill((*HEAT,int(40+170*row["heat"][c])))
+                screen.blit(tint,cell[:2])
         screen.blit(font_tiny.render(row["text"],True,INK),(SAVED_X+8,y+mini+4))
         row["_rect"]=pygame.Rect(SAVED_X+4,y,SAVED_W-12,mini+22)
         y+=mini+30
@@ -309,38 +269,91 @@ def draw_program_panel():
         screen.blit(font_s.render(line,True,(40,120,40)),(SAVED_X+10,oy))
         oy+=18
 
+def draw_stats_overlay():
+    global stats_lines
+    if stats.count%30==0 or not stats_lines: stats_lines=stats.lines() # twice a second is plenty and keeps the overlay cheap
+    w=max(font_tiny.size(line)[0] for line in stats_lines)+16; h=len(stats_lines)*14+10
+    box=pygame.Surface((w,h),pygame.SRCALPHA); box.fill((255,255,255,210))
+    screen.blit(box,(W-w-24,24))
+    for i,line in enumerate(stats_lines):
+        screen.blit(font_tiny.render(line,True,INK),(W-w-16,29+i*14))
+
 # ───────── main loop ─────────
-def main():
+def handle_event(e):
+    """React to one input event, returns False when the notebook should quit."""
     global cursor,duck_heading,toast
+    if e.type==pygame.QUIT: return False
+    elif e.type==pygame.KEYDOWN:
+        if e.key==pygame.K_q: return False
+        elif e.key in (pygame.K_LEFT,pygame.K_a): cursor=max(0,cursor-1); duck_heading=-1
+        elif e.key in (pygame.K_RIGHT,pygame.K_d): cursor=min(ROW_LEN-1,cursor+1); duck_heading=1
+        elif e.key==pygame.K_SPACE: cycle_here()
+        elif e.key==pygame.K_BACKSPACE: set_here(-1)
+        elif e.key==pygame.K_c: clear_row()
+        elif e.key in (pygame.K_RETURN,pygame.K_KP_ENTER): add_current_row()
+        elif e.key==pygame.K_r: run_program()
+        elif e.key==pygame.K_s: save_duck()
+        elif e.key==pygame.K_o: load_latest_duck()
+        elif e.key==pygame.K_h: toggle_heat()
+        elif e.key==pygame.K_f: toggle_stats()
+        elif e.unicode and e.unicode.isdigit(): set_here(int(e.unicode))
+    elif e.type==pygame.MOUSEBUTTONDOWN and e.button==1:
+        mx,my=e.pos
+        if GRID_Y<=my<GRID_Y+CELL:
+            idx=(mx-GRID_X)//CELL
+            if 0<=idx<ROW_LEN: cursor=idx
+        for i,row in enumerate(saved_rows):
+            if row.get("_rect") and row["_rect"].collidepoint(mx,my):
+                load_saved_row_at(i); toast=f"loaded line {i+1}"; break
+    return True
+
+def draw_frame(dt):
+    with stats.phase("draw_paper_bg"): draw_paper_bg()
+    with stats.phase("draw_row"): draw_row()
+    with stats.phase("draw_duck_at_cursor"): draw_duck_at_cursor(dt)
+    with stats.phase("draw_program_panel"): draw_program_panel()
+    with stats.phase("draw_header"): draw_header()
+    if stats_mode:
+        with stats.phase("overlay"): draw_stats_overlay()
+    with stats.phase("flip"): pygame.display.flip()
+
+def main(argv=None):
+    global stats,stats_mode
+    arg_parser=argparse.ArgumentParser(description="Duck Notebook")
+    arg_parser.add_argument("--stats",action="store_true",help="start with the frame-time overlay on")
+    arg_parser.add_argument("--record",metavar="FILE",help="write the input events of this session to FILE")
+    arg_parser.add_argument("--replay",metavar="FILE",help="play back input recorded with --record instead of reading the keyboard")
+    arg_parser.add_argument("--headless",action="store_true",help="with --replay: use the SDL dummy video driver, print the frame-time report at the end")
+    args=arg_parser.parse_args(argv)
+    if args.headless and not args.replay: arg_parser.error("--headless needs --replay, there is no other input without a window")
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"]="dummy"; os.environ["SDL_AUDIODRIVER"]="dummy"
+    init_ui()
+    recorder=EventRecorder(args.record) if args.record else None
+    replayer=EventReplayer(args.replay) if args.replay else None
+    if replayer: stats=FrameStats(window=None) # keep every frame for the report
+    stats_mode=stats_mode or args.stats
+
     running=True
     while running:
-        dt=clock.tick(FPS)/1000
-        for e in pygame.event.get():
-            if e.type==pygame.QUIT: running=False
-            elif e.type==pygame.KEYDOWN:
-                if e.key==pygame.K_q: running=False
-                elif e.key in (pygame.K_LEFT,pygame.K_a): cursor=max(0,cursor-1); duck_heading=-1
-                elif e.key in (pygame.K_RIGHT,pygame.K_d): cursor=min(ROW_LEN-1,cursor+1); duck_heading=1
-                elif e.key==pygame.K_SPACE: cycle_here()
-                elif e.key==pygame.K_BACKSPACE: set_here(-1)
-                elif e.key==pygame.K_c: clear_row()
-                elif e.key in (pygame.K_RETURN,pygame.K_KP_ENTER): add_current_row()
-                elif e.key==pygame.K_r: run_program()
-                elif e.key==pygame.K_s: save_duck()
-                elif e.key==pygame.K_o: load_latest_duck()
-                elif e.unicode and e.unicode.isdigit(): set_here(int(e.unicode))
-            elif e.type==pygame.MOUSEBUTTONDOWN and e.button==1:
-                mx,my=e.pos
-                if GRID_Y<=my<GRID_Y+CELL:
-                    idx=(mx-GRID_X)//CELL
-                    if 0<=idx<ROW_LEN: cursor=idx
-                for i,row in enumerate(saved_rows):
-                    if row.get("_rect") and row["_rect"].collidepoint(mx,my):
-                        load_saved_row_at(i); toast=f"loaded line {i+1}"; break
-
-        draw_paper_bg(); 
-        draw_row(); draw_duck_at_cursor(dt); draw_program_panel(); draw_header()
-        pygame.display.flip()
+        if replayer:
+            if replayer.done: break
+            clock.tick(); dt=1/FPS # run as fast as possible with a fixed step so replays are repeatable
+        else:
+            dt=clock.tick(FPS)/1000
+        stats.start_frame()
+        with stats.phase("events"):
+            if replayer: pygame.event.pump(); events=replayer.next_frame()
+            else: events=pygame.event.get()
+            if recorder: recorder.record(events)
+            for e in events:
+                if not handle_event(e): running=False
+        draw_frame(dt)
+        stats.end_frame()
+
+    if recorder: recorder.close()
     pygame.quit()
+    if args.headless or replayer: print(stats.report())
 
-if __name__=="__main__": main()
+if __name__=="__main__": sys.exit(main())
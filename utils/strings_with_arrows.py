@@ -1,27 +1,39 @@
-def string_with_arrows(text,pos_start,pos_end):
-    result=""
+_line_starts_cache = {} # text -> line starts, for the last few sources (functools.lru_cache costs ms to import)
+CACHE_SIZE = 32
+
+def line_starts(text):
+    """Index of the first character of every line, computed once per source text."""
+    starts = _line_starts_cache.get(text)
+    if starts is not None: return starts
+    
+    starts = [0]
+    idx = text.find("\n")
+    while idx >= 0:
+        starts.append(idx + 1)
+        idx = text.find("\n", idx + 1)
     
-    #calculate indices
-    idx_start = max(text.rfind("\n",0, pos_start.idx),0)
-    idx_end = text.find("\n", idx_start +1)
-    if idx_end < 0 : idx_end = len(text)
+    if len(_line_starts_cache) >= CACHE_SIZE:
+        _line_starts_cache.pop(next(iter(_line_starts_cache)), None) # drop the oldest
+    _line_starts_cache[text] = starts
+    return starts
+
+def string_with_arrows(text,pos_start,pos_end):
+    starts = line_starts(text)
+    lines = []
     
-    #generate each line
+    #generate each line, only the lines between pos_start and pos_end are looked at
     line_count = pos_end.ln - pos_start.ln +1
     for i in range(line_count):
+        ln = pos_start.ln - pos_start.ftxt_ln + i #line inside text, which may not start at the top of the file
+        idx_start = starts[ln] - 1 if ln > 0 else 0 #lines after the first keep the newline in front of them
+        idx_end = starts[ln + 1] - 1 if ln + 1 < len(starts) else len(text)
+        
         #calculate line columns
         line = text[idx_start:idx_end]
         col_start = pos_start.col if i==0 else 0
         col_end = pos_end.col if i == line_count -1 else len(line) -1
         
         #Append to result
-        result += line + "\n"
-        result += " " * col_start + "^" * (col_end - col_start)
-        
-        #recalculate indices
-        idx_start = idx_end
-        idx_end = text.find("\n", idx_start +1)
-        if idx_end < 0: idx_end = len(text)
+        lines.append(line + "\n" + " " * col_start + "^" * (col_end - col_start))
         
-    return result.replace("\t", "")
-    
\ No newline at end of file
+    return "".join(lines).replace("\t", "")